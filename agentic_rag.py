@@ -1,13 +1,11 @@
-from typing import Optional, Dict, List
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from typing import Optional, Dict, List, Tuple
+from langchain_core.embeddings import Embeddings
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.document_loaders import RecursiveUrlLoader
-from langchain_chroma import Chroma
-from langchain_community.vectorstores.upstash import UpstashVectorStore
 from textwrap import dedent
 
 from agno.agent import Agent, AgentMemory
 from agno.knowledge.langchain import LangChainKnowledgeBase
+from agno.models.base import Model
 from agno.models.google import Gemini
 from agno.tools.tavily import TavilyTools
 from agno.utils.pprint import pprint_run_response
@@ -16,6 +14,259 @@ from datetime import datetime
 from textwrap import dedent
 from dotenv import load_dotenv
 import os
+import threading
+
+from index_refresh import (
+    COLLECTION_PREFIX,
+    DEFAULT_URLS,
+    activate_collection,
+    legacy_collection_count,
+    read_active_collection,
+    refresh_index,
+)
+from retrieval import VersionedRetriever
+from vector_backends import DEFAULT_BACKEND, HNSWParams
+
+
+DESCRIPTION = dedent("""
+        An advanced Customer Data Platform (CDP) support agent specializing in detailed "how-to" guidance for Segment, 
+        mParticle, Lytics, and Zeotap. This agent leverages official documentation to provide accurate, step-by-step 
+        instructions for implementing specific features, solving technical challenges, and optimizing CDP workflows 
+        across all four platforms.
+    """)
+
+INSTRUCTIONS = ["""
+        You are an expert CDP support agent with deep knowledge of Segment, mParticle, Lytics, and Zeotap. Your primary 
+        mission is to provide precise, actionable guidance on how to accomplish specific tasks within these platforms.
+
+        KNOWLEDGE ARCHITECTURE:
+        1. PRIMARY KNOWLEDGE BASE:
+        - Segment Documentation: https://segment.com/docs/?ref=nav
+            Key sections: Sources, Destinations, Protocols, API Reference
+        - mParticle Documentation: https://docs.mparticle.com/
+            Key sections: Getting Started, Platform Guide, Integrations, SDKs
+        - Lytics Documentation: https://docs.lytics.com/
+            Key sections: Data Collection, Audience Building, Campaigns, Integrations
+        - Zeotap Documentation: https://docs.zeotap.com/home/en-us/
+            Key sections: Implementation, Data Management, Customer Intelligence, Integrations
+
+        2. SEARCH TOOLS AND METHODOLOGY:
+        - When querying documentation, prioritize exact matches for specific "how-to" keywords
+        - Use search queries that include the platform name, feature, and action terms
+        - For each search, evaluate results based on:
+            a) Relevance to the specific task mentioned
+            b) Recency of documentation (prefer latest versions)
+            c) Completeness of instructions
+        - Follow documentation link structures to find related information when necessary
+
+        QUESTION ANALYSIS AND RESPONSE STRATEGY:
+
+        1. PLATFORM IDENTIFICATION:
+        - Determine which CDP(s) the question pertains to
+        - If no specific platform is mentioned but the question is CDP-related, provide guidance for all applicable platforms
+        - Example analysis: "How do I create a segment?" → Identify that this is a general CDP question applicable to all platforms
+
+        2. TASK CATEGORIZATION:
+        - Implementation questions (setup, installation, configuration)
+        - Data collection questions (sources, tracking, event schemas)
+        - User/audience management questions (profiles, segments, cohorts)
+        - Integration questions (connections to other tools/platforms)
+        - Analytics questions (reporting, metrics, insights)
+        - Troubleshooting questions (errors, validation, debugging)
+
+        3. INFORMATION RETRIEVAL DEPTH:
+        - For basic questions: Provide complete step-by-step guidance with all relevant details
+        - For complex questions: Break down into component parts and address each specifically
+        - For advanced configurations: Include prerequisites, dependencies, and compatibility notes
+        - For comparison questions: Structure information in parallel for easy feature-by-feature comparison
+
+        4. RESPONSE CONSTRUCTION:
+        - Begin with a direct answer to the primary question
+        - Provide context about why this process matters or when it should be used
+        - Present step-by-step instructions with explicit ordering
+        - Include any JSON/code examples, API parameters, or configuration settings
+        - Note any platform-specific terminology or concepts that may need clarification
+        - End with verification steps to confirm successful implementation
+        - Add troubleshooting guidance for common issues with this specific task
+
+        SPECIAL QUESTION HANDLING:
+
+        1. EXTREMELY LONG QUESTIONS:
+        - Identify the core "how-to" request within verbose questions
+        - Acknowledge all parts of the question but focus your detailed response on the central task
+        - If multiple questions are embedded, address them in logical order of implementation
+        - Example approach: "I notice your question covers several aspects of Segment implementation. Let me address each component, starting with the core setup process..."
+
+        2. NON-CDP QUESTIONS:
+        - Respectfully clarify your specialization in CDP platforms
+        - Redirect to relevant CDP topics if possible
+        - Example response: "As a CDP specialist, I focus on Segment, mParticle, Lytics, and Zeotap. While I can't provide information about movie releases, I'd be happy to help with any questions about managing customer data or implementing CDP solutions."
+
+        3. CROSS-CDP COMPARISONS:
+        - Structure comparisons using consistent categories across all platforms:
+            a) Implementation complexity
+            b) Feature availability
+            c) Integration capabilities
+            d) Performance considerations
+            e) Use case suitability
+        - Highlight unique strengths and limitations of each platform
+        - Provide specific examples of how each platform handles the requested functionality
+        - Avoid subjective platform preferences; focus on factual differences
+
+        4. TECHNICAL EDGE CASES:
+        - For questions about beta features: Note the experimental status and any limitations
+        - For questions about deprecated features: Provide both the legacy approach and the recommended alternative
+        - For enterprise-only features: Clarify availability limitations while still providing implementation details
+        - For undocumented features: State clearly if information is limited in official documentation
+
+        RESPONSE QUALITY STANDARDS:
+
+        1. ACCURACY REQUIREMENTS:
+        - All steps must be verified against current documentation
+        - Include version information when platform features vary by version
+        - Distinguish between required and optional configuration steps
+        - Specify any prerequisites or dependencies for each process
+
+        2. CLARITY GUIDELINES:
+        - Use consistent terminology from the official documentation
+        - Define any CDP-specific jargon or technical terms
+        - Use visual structural elements (bullets, numbering, headings) to organize complex information
+        - Present information in the order of implementation
+
+        3. COMPREHENSIVENESS CHECKS:
+        - Ensure all parts of multi-step processes are included
+        - Address both the "how" and the "why" of implementation steps
+        - Include validation methods to confirm successful implementation
+        - Anticipate and address common follow-up questions
+
+        4. SOURCE ATTRIBUTION:
+        - Cite specific documentation sections, pages, or articles
+        - Include direct links to documentation when possible
+        - Clearly distinguish between information from different documentation sources
+        - Acknowledge when information is synthesized from multiple sources
+    """]
+
+EXPECTED_OUTPUT = dedent("""\
+        # How to [Specific Task] in [Platform Name]
+
+        ## Overview
+        [1-2 sentence explanation of what this process accomplishes and why it's important]
+
+        ## Prerequisites
+        Before you begin, ensure you have:
+        * [Required access/permissions]
+        * [Necessary setup steps completed]
+        * [Any required dependencies]
+
+        ## Detailed Steps
+
+        ### 1. [First Major Step]
+        1.1. Navigate to [specific location in platform]
+        1.2. Select [specific option/button/menu item]
+        1.3. Configure the following settings:
+        * [Setting 1]: [Explanation + recommended value]
+        * [Setting 2]: [Explanation + recommended value]
+        
+        ### 2. [Second Major Step]
+        2.1. [Detailed instruction]
+        2.2. [Detailed instruction]
+        
+        ### 3. [Additional Steps as Needed]
+        [Detailed breakdowns of each step]
+
+        ## Example Implementation
+        json
+        {
+        "sample": "configuration",
+        "with": "realistic values",
+        "that": "demonstrate the feature"
+        }
+        
+
+        ## Validation
+        To verify successful implementation:
+        1. [Verification step 1]
+        2. [Verification step 2]
+        
+        ## Common Issues and Troubleshooting
+        * *[Common Issue 1]*: [Solution approach]
+        * *[Common Issue 2]*: [Solution approach]
+        
+        ## Related Features
+        You might also want to explore:
+        * [Related feature 1] - [Brief explanation of relationship]
+        * [Related feature 2] - [Brief explanation of relationship]
+        
+        ## Documentation References
+        This information was compiled from:
+        * [Specific section of documentation with link]
+        * [Additional resource if applicable]
+        
+        Would you like me to elaborate on any particular aspect of this process?
+    """)
+
+
+_knowledge_bases: Dict[Tuple[str, Optional[int], str, Optional[int]], LangChainKnowledgeBase] = {}
+_knowledge_lock = threading.Lock()
+
+
+def get_knowledge_base(
+    db_path: str = "./chroma_db",
+    urls: Optional[Dict[str, str]] = None,
+    embeddings: Optional[Embeddings] = None,
+    page_cache_dir: str = "./page_cache",
+    offline_crawl: bool = False,
+    backend: str = DEFAULT_BACKEND,
+    exact_threshold: Optional[int] = None,
+    hnsw: Optional[HNSWParams] = None,
+) -> LangChainKnowledgeBase:
+    """Get the process-wide knowledge base for a vector database path.
+
+    The knowledge base only reads through the versioned retriever, so a single
+    instance is shared by every agent instead of being rebuilt per session.
+    The first call for a path also bootstraps the index if none exists yet.
+
+    Args:
+        backend: Vector search backend, "chroma", "numpy" or "auto"
+        exact_threshold: Largest collection the "auto" backend searches exactly
+        hnsw: HNSW settings for a collection bootstrapped by this call; later
+            versions take theirs from the refresh worker
+    """
+    key = (db_path, id(embeddings) if embeddings is not None else None, backend, exact_threshold)
+    with _knowledge_lock:
+        if key in _knowledge_bases:
+            return _knowledge_bases[key]
+
+        if embeddings is None:
+            embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+
+        if read_active_collection(db_path) is None:
+            # Adopt a collection built before versioning, otherwise build the first
+            # version inline. Later rebuilds run out of process via index_refresh.py.
+            collection_count = legacy_collection_count(db_path)
+            if collection_count > 0:
+                print(f"Using existing collection with {collection_count} documents")
+                activate_collection(COLLECTION_PREFIX, db_path)
+            else:
+                print(f"No documents found in collection. Loading from URLs...")
+                refresh_index(
+                    db_path=db_path,
+                    urls=urls,
+                    embeddings=embeddings,
+                    page_cache_dir=page_cache_dir,
+                    offline_crawl=offline_crawl,
+                    hnsw=hnsw,
+                )
+
+        retriever = VersionedRetriever(
+            db_path=db_path,
+            embeddings=embeddings,
+            backend=backend,
+            exact_threshold=exact_threshold,
+        )
+        knowledge_base = LangChainKnowledgeBase(retriever=retriever)
+        _knowledge_bases[key] = knowledge_base
+        return knowledge_base
 
 
 def get_cdp_support_agent(  
@@ -27,6 +278,13 @@ def get_cdp_support_agent(
     urls: Optional[Dict[str, str]] = None,
     embeddings_model: Optional[str] = None,
     show_tool_calls: bool = False,
+    page_cache_dir: str = "./page_cache",
+    offline_crawl: bool = False,
+    model: Optional[Model] = None,
+    embeddings: Optional[Embeddings] = None,
+    backend: str = DEFAULT_BACKEND,
+    exact_threshold: Optional[int] = None,
+    hnsw: Optional[HNSWParams] = None,
 ) -> Agent:
     """Get a CDP Support Agent with knowledge base and tools.
     
@@ -42,6 +300,16 @@ def get_cdp_support_agent(
         embeddings_model: Hugging Face model name for embeddings
             If None, defaults to "BAAI/bge-small-en"
         show_tool_calls: Whether to show tool calls in agent output
+        page_cache_dir: Directory of the compressed raw page cache used when crawling
+        offline_crawl: Rebuild the knowledge base from the page cache only,
+            without any network requests
+        model: Model instance to use instead of Gemini(model_id), e.g. a fake
+            model for load testing
+        embeddings: Embeddings to use instead of Google text-embedding-004
+        backend: Vector search backend, "chroma" (HNSW), "numpy" (exact) or "auto"
+        exact_threshold: Largest collection the "auto" backend searches exactly;
+            measure it with ``python vector_backends.py --db-path <db_path>``
+        hnsw: HNSW settings used if the knowledge base has to be built on startup
         
     Returns:
         Agent: Configured CDP support agent for Segment, mParticle, Lytics, and Zeotap
@@ -50,12 +318,7 @@ def get_cdp_support_agent(
     load_dotenv()
     
     if urls is None:
-        urls = {
-            "SEGMENT": "https://segment.com/docs/?ref=nav",
-            "MPARTICLE": "https://docs.mparticle.com/",
-            "LYTICS": "https://docs.lytics.com/",
-            "ZEOTAP": "https://docs.zeotap.com/home/en-us/"
-        }
+        urls = DEFAULT_URLS
     
     # embeddings_model_name = embeddings_model or "BAAI/bge-small-en"
     # model_kwargs = {"device": "cpu"}
@@ -66,233 +329,30 @@ def get_cdp_support_agent(
         # encode_kwargs=encode_kwargs
     # )
     
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
-    
-    collection_name = "CustomerSupport"
-    vectorstore = Chroma(
-        collection_name=collection_name,
-        embedding_function=embeddings,
-        persist_directory=db_path,
+    knowledge_base = get_knowledge_base(
+        db_path=db_path,
+        urls=urls,
+        embeddings=embeddings,
+        page_cache_dir=page_cache_dir,
+        offline_crawl=offline_crawl,
+        backend=backend,
+        exact_threshold=exact_threshold,
+        hnsw=hnsw,
     )
 
-    collection_count = vectorstore._collection.count()
-    if collection_count == 0:
-        print(f"No documents found in collection. Loading from URLs...")
-        loaders = {id: RecursiveUrlLoader(url) for id, url in urls.items()}
-        documents = []
-        for id, loader in loaders.items():
-            try:
-                docs = loader.load()
-                for doc in docs:
-                    doc.metadata['source_id'] = id
-                documents.extend(docs)
-                print(f"Successfully loaded {id}")
-            except Exception as e:
-                print(f"Error loading {id}: {str(e)}")
-
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=4096, chunk_overlap=50
-        )
-        
-        print(f"Processing {len(documents)} documents...")
-        docs = text_splitter.split_documents(documents)
-        print(f"Created {len(docs)} chunks")
-        
-        print("Adding documents to vectorstore...")
-        vectorstore.add_documents(docs)
-        print("Documents added successfully")
-    else:
-        print(f"Using existing collection with {collection_count} documents")
-
-    retriever = vectorstore.as_retriever()
-    knowledge_base = LangChainKnowledgeBase(retriever=retriever)
-
     cdp_support_agent = Agent(
         name="CDP_Support_Agent",
         user_id=user_id,
         session_id=session_id,
-        model=Gemini(id="gemini-2.0-flash-exp"),
+        model=model or Gemini(id=model_id),
         knowledge=knowledge_base,
         add_references=True,
         markdown=True,
         tools=[TavilyTools()],
         show_tool_calls=show_tool_calls,
-        description = dedent("""
-            An advanced Customer Data Platform (CDP) support agent specializing in detailed "how-to" guidance for Segment, 
-            mParticle, Lytics, and Zeotap. This agent leverages official documentation to provide accurate, step-by-step 
-            instructions for implementing specific features, solving technical challenges, and optimizing CDP workflows 
-            across all four platforms.
-        """),
-
-        instructions = ["""
-            You are an expert CDP support agent with deep knowledge of Segment, mParticle, Lytics, and Zeotap. Your primary 
-            mission is to provide precise, actionable guidance on how to accomplish specific tasks within these platforms.
-
-            KNOWLEDGE ARCHITECTURE:
-            1. PRIMARY KNOWLEDGE BASE:
-            - Segment Documentation: https://segment.com/docs/?ref=nav
-                Key sections: Sources, Destinations, Protocols, API Reference
-            - mParticle Documentation: https://docs.mparticle.com/
-                Key sections: Getting Started, Platform Guide, Integrations, SDKs
-            - Lytics Documentation: https://docs.lytics.com/
-                Key sections: Data Collection, Audience Building, Campaigns, Integrations
-            - Zeotap Documentation: https://docs.zeotap.com/home/en-us/
-                Key sections: Implementation, Data Management, Customer Intelligence, Integrations
-
-            2. SEARCH TOOLS AND METHODOLOGY:
-            - When querying documentation, prioritize exact matches for specific "how-to" keywords
-            - Use search queries that include the platform name, feature, and action terms
-            - For each search, evaluate results based on:
-                a) Relevance to the specific task mentioned
-                b) Recency of documentation (prefer latest versions)
-                c) Completeness of instructions
-            - Follow documentation link structures to find related information when necessary
-
-            QUESTION ANALYSIS AND RESPONSE STRATEGY:
-
-            1. PLATFORM IDENTIFICATION:
-            - Determine which CDP(s) the question pertains to
-            - If no specific platform is mentioned but the question is CDP-related, provide guidance for all applicable platforms
-            - Example analysis: "How do I create a segment?" → Identify that this is a general CDP question applicable to all platforms
-
-            2. TASK CATEGORIZATION:
-            - Implementation questions (setup, installation, configuration)
-            - Data collection questions (sources, tracking, event schemas)
-            - User/audience management questions (profiles, segments, cohorts)
-            - Integration questions (connections to other tools/platforms)
-            - Analytics questions (reporting, metrics, insights)
-            - Troubleshooting questions (errors, validation, debugging)
-
-            3. INFORMATION RETRIEVAL DEPTH:
-            - For basic questions: Provide complete step-by-step guidance with all relevant details
-            - For complex questions: Break down into component parts and address each specifically
-            - For advanced configurations: Include prerequisites, dependencies, and compatibility notes
-            - For comparison questions: Structure information in parallel for easy feature-by-feature comparison
-
-            4. RESPONSE CONSTRUCTION:
-            - Begin with a direct answer to the primary question
-            - Provide context about why this process matters or when it should be used
-            - Present step-by-step instructions with explicit ordering
-            - Include any JSON/code examples, API parameters, or configuration settings
-            - Note any platform-specific terminology or concepts that may need clarification
-            - End with verification steps to confirm successful implementation
-            - Add troubleshooting guidance for common issues with this specific task
-
-            SPECIAL QUESTION HANDLING:
-
-            1. EXTREMELY LONG QUESTIONS:
-            - Identify the core "how-to" request within verbose questions
-            - Acknowledge all parts of the question but focus your detailed response on the central task
-            - If multiple questions are embedded, address them in logical order of implementation
-            - Example approach: "I notice your question covers several aspects of Segment implementation. Let me address each component, starting with the core setup process..."
-
-            2. NON-CDP QUESTIONS:
-            - Respectfully clarify your specialization in CDP platforms
-            - Redirect to relevant CDP topics if possible
-            - Example response: "As a CDP specialist, I focus on Segment, mParticle, Lytics, and Zeotap. While I can't provide information about movie releases, I'd be happy to help with any questions about managing customer data or implementing CDP solutions."
-
-            3. CROSS-CDP COMPARISONS:
-            - Structure comparisons using consistent categories across all platforms:
-                a) Implementation complexity
-                b) Feature availability
-                c) Integration capabilities
-                d) Performance considerations
-                e) Use case suitability
-            - Highlight unique strengths and limitations of each platform
-            - Provide specific examples of how each platform handles the requested functionality
-            - Avoid subjective platform preferences; focus on factual differences
-
-            4. TECHNICAL EDGE CASES:
-            - For questions about beta features: Note the experimental status and any limitations
-            - For questions about deprecated features: Provide both the legacy approach and the recommended alternative
-            - For enterprise-only features: Clarify availability limitations while still providing implementation details
-            - For undocumented features: State clearly if information is limited in official documentation
-
-            RESPONSE QUALITY STANDARDS:
-
-            1. ACCURACY REQUIREMENTS:
-            - All steps must be verified against current documentation
-            - Include version information when platform features vary by version
-            - Distinguish between required and optional configuration steps
-            - Specify any prerequisites or dependencies for each process
-
-            2. CLARITY GUIDELINES:
-            - Use consistent terminology from the official documentation
-            - Define any CDP-specific jargon or technical terms
-            - Use visual structural elements (bullets, numbering, headings) to organize complex information
-            - Present information in the order of implementation
-
-            3. COMPREHENSIVENESS CHECKS:
-            - Ensure all parts of multi-step processes are included
-            - Address both the "how" and the "why" of implementation steps
-            - Include validation methods to confirm successful implementation
-            - Anticipate and address common follow-up questions
-
-            4. SOURCE ATTRIBUTION:
-            - Cite specific documentation sections, pages, or articles
-            - Include direct links to documentation when possible
-            - Clearly distinguish between information from different documentation sources
-            - Acknowledge when information is synthesized from multiple sources
-        """],
-
-        expected_output = dedent("""\
-            # How to [Specific Task] in [Platform Name]
-
-            ## Overview
-            [1-2 sentence explanation of what this process accomplishes and why it's important]
-
-            ## Prerequisites
-            Before you begin, ensure you have:
-            * [Required access/permissions]
-            * [Necessary setup steps completed]
-            * [Any required dependencies]
-
-            ## Detailed Steps
-
-            ### 1. [First Major Step]
-            1.1. Navigate to [specific location in platform]
-            1.2. Select [specific option/button/menu item]
-            1.3. Configure the following settings:
-            * [Setting 1]: [Explanation + recommended value]
-            * [Setting 2]: [Explanation + recommended value]
-            
-            ### 2. [Second Major Step]
-            2.1. [Detailed instruction]
-            2.2. [Detailed instruction]
-            
-            ### 3. [Additional Steps as Needed]
-            [Detailed breakdowns of each step]
-
-            ## Example Implementation
-            json
-            {
-            "sample": "configuration",
-            "with": "realistic values",
-            "that": "demonstrate the feature"
-            }
-            
-
-            ## Validation
-            To verify successful implementation:
-            1. [Verification step 1]
-            2. [Verification step 2]
-            
-            ## Common Issues and Troubleshooting
-            * *[Common Issue 1]*: [Solution approach]
-            * *[Common Issue 2]*: [Solution approach]
-            
-            ## Related Features
-            You might also want to explore:
-            * [Related feature 1] - [Brief explanation of relationship]
-            * [Related feature 2] - [Brief explanation of relationship]
-            
-            ## Documentation References
-            This information was compiled from:
-            * [Specific section of documentation with link]
-            * [Additional resource if applicable]
-            
-            Would you like me to elaborate on any particular aspect of this process?
-        """),
+        description=DESCRIPTION,
+        instructions=INSTRUCTIONS,
+        expected_output=EXPECTED_OUTPUT,
         add_datetime_to_instructions=True,
         debug_mode=debug_mode,
         read_chat_history=True,
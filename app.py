@@ -2,16 +2,24 @@ import streamlit as st
 import os
 import tempfile
 import requests
+import uuid
 from typing import List
 from dotenv import load_dotenv
 
-from agno.agent import Agent
+from agno.agent import Agent, AgentMemory
 from agno.document import Document
 from agno.models.google import Gemini
 from agno.utils.log import logger
 from agno.utils.pprint import pprint_run_response
 
-from agentic_rag import get_cdp_support_agent  # Modified function name to match CDP context
+from agno.memory.agent import AgentRun
+from agno.models.message import Message
+from agno.run.response import RunResponse
+
+from classifier import OFF_TOPIC_RESPONSE, question_classifier
+from coalesce import question_flights
+from retrieval import run_scoped
+from session_manager import agent_pool
 
 load_dotenv()
 
@@ -198,22 +206,29 @@ CUSTOM_CSS = """
 
 st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
-if "messages" not in st.session_state:
-    st.session_state["messages"] = []
-if "cdp_agent" not in st.session_state:
-    st.session_state["cdp_agent"] = None
-if "loaded_urls" not in st.session_state:
-    st.session_state.loaded_urls = set()
-if "knowledge_base_initialized" not in st.session_state:
-    st.session_state.knowledge_base_initialized = False
-if "selected_platform" not in st.session_state:
-    st.session_state.selected_platform = "All Platforms"
+
+def init_session_state(session_state=None):
+    """Populate default session state keys"""
+    if session_state is None:
+        session_state = st.session_state
+    if "messages" not in session_state:
+        session_state["messages"] = []
+    if "session_id" not in session_state:
+        session_state["session_id"] = str(uuid.uuid4())
+    if "loaded_urls" not in session_state:
+        session_state["loaded_urls"] = set()
+    if "knowledge_base_initialized" not in session_state:
+        session_state["knowledge_base_initialized"] = False
+    if "selected_platform" not in session_state:
+        session_state["selected_platform"] = "All Platforms"
+    return session_state
 
 
 def restart_agent():
     """Reset the agent and clear chat history"""
     logger.debug("---*--- Restarting agent ---*---")
-    st.session_state["cdp_agent"] = None
+    agent_pool.release(st.session_state["session_id"])
+    st.session_state["session_id"] = str(uuid.uuid4())
     st.session_state["messages"] = []
     st.session_state.knowledge_base_initialized = False
     st.rerun()
@@ -299,22 +314,99 @@ def about_widget():
         """)
 
 
-def initialize_agent(debug_mode=False, show_tool_calls=True):
-    """Initialize or retrieve the CDP Support Agent"""
-    if "cdp_agent" not in st.session_state or st.session_state["cdp_agent"] is None:
-        logger.info("---*--- Creating CDP Support Agent ---*---")
-        agent = get_cdp_support_agent(
-            debug_mode=debug_mode,
-            show_tool_calls=show_tool_calls
+def initialize_agent(debug_mode=False, show_tool_calls=True, session_state=None, **agent_kwargs):
+    """Retrieve the CDP Support Agent for this session from the shared agent pool.
+
+    The pool rebuilds agents it has hibernated while the session was idle.
+    """
+    if session_state is None:
+        session_state = st.session_state
+    return agent_pool.get(
+        session_state["session_id"],
+        debug_mode=debug_mode,
+        show_tool_calls=show_tool_calls,
+        **agent_kwargs
+    )
+
+
+def lease_agent(debug_mode=False, show_tool_calls=True, session_state=None, **agent_kwargs):
+    """Lease this session's agent from the pool while a response streams.
+
+    Use as a context manager; the pool will not hibernate the agent until the
+    block exits, so the finished run is kept in the session's history.
+    """
+    if session_state is None:
+        session_state = st.session_state
+    return agent_pool.lease(
+        session_state["session_id"],
+        debug_mode=debug_mode,
+        show_tool_calls=show_tool_calls,
+        **agent_kwargs
+    )
+
+
+def record_shared_run(cdp_agent, question, chunks):
+    """Add a coalesced answer to the agent's memory as if the agent had run it itself.
+
+    A coalesced follower's agent never runs the question, so without this its
+    next message would be answered without the first turn in its history.
+    """
+    content = "".join(chunk.content for chunk in chunks if getattr(chunk, "content", None))
+    user_message = Message(role="user", content=question)
+    assistant_message = Message(role="assistant", content=content)
+    if cdp_agent.memory is None:
+        cdp_agent.memory = AgentMemory()
+    cdp_agent.memory.add_messages(messages=[user_message, assistant_message])
+    cdp_agent.memory.add_run(
+        AgentRun(
+            message=user_message,
+            response=RunResponse(
+                content=content,
+                session_id=cdp_agent.session_id,
+                messages=[user_message, assistant_message],
+            ),
         )
-        st.session_state["cdp_agent"] = agent
-    return st.session_state["cdp_agent"]
+    )
+
+
+def user_questions(messages):
+    """Return the content of the user messages in a chat history."""
+    return [m["content"] for m in messages if m.get("role") == "user"]
+
+
+def generate_response(cdp_agent, question, platform, coalesce=False, history=None):
+    """Stream response chunks for a question.
+
+    A local pre-classifier answers clearly off-topic questions immediately and
+    scopes retrieval to the platforms the question mentions; ``history`` holds
+    the session's earlier user questions so follow-ups to a CDP conversation are
+    never short-circuited. Opening questions carry no chat history, so with
+    coalesce=True identical ones from concurrent sessions share a single agent run.
+    """
+    classification = question_classifier.classify(question, history=history)
+    if classification.off_topic:
+        logger.debug(f"Off-topic question answered locally ({classification.reason})")
+        return iter([RunResponse(content=OFF_TOPIC_RESPONSE)])
+
+    def run():
+        return run_scoped(classification.platforms, lambda: cdp_agent.run(question, stream=True))
+
+    if coalesce:
+        return question_flights.stream(
+            question,
+            platform,
+            run,
+            on_shared=lambda chunks: record_shared_run(cdp_agent, question, chunks),
+        )
+    return run()
 
 
 def main():
     ####################################################################
     # App header
     ####################################################################
+    init_session_state()
+
     st.markdown("<h1 class='main-title'>CDP Support Assistant</h1>", unsafe_allow_html=True)
     st.markdown(
         "<p class='subtitle'>Your expert guide to Customer Data Platforms - helping you navigate Segment, mParticle, Lytics, and Zeotap</p>",
@@ -334,7 +426,7 @@ def main():
     ####################################################################
     # Initialize Agent
     ####################################################################
-    cdp_agent: Agent = initialize_agent(debug_mode=False, show_tool_calls=True)
+    initialize_agent(debug_mode=False, show_tool_calls=True)
 
     ####################################################################
     # Platform selector
@@ -495,24 +587,32 @@ def main():
             resp_container = st.empty()
             with st.spinner("🔍 Searching documentation..."):
                 response = ""
+                tools = None
                 try:
-                    # Run the agent and stream the response
-                    run_response = cdp_agent.run(question, stream=True)
-                    for _resp_chunk in run_response:
-                        # Display tool calls if available
-                        if hasattr(_resp_chunk, 'tools') and _resp_chunk.tools and len(_resp_chunk.tools) > 0:
-                            display_tool_calls(tool_calls_container, _resp_chunk.tools)
-
-                        # Display response
-                        if hasattr(_resp_chunk, 'content') and _resp_chunk.content is not None:
-                            response += _resp_chunk.content
-                            resp_container.markdown(response)
+                    # Run the agent and stream the response; the lease keeps the
+                    # pool from hibernating the agent until the run is recorded
+                    with lease_agent(debug_mode=False, show_tool_calls=True) as cdp_agent:
+                        run_response = generate_response(
+                            cdp_agent,
+                            question,
+                            st.session_state.selected_platform,
+                            coalesce=len(st.session_state["messages"]) == 1,
+                            history=user_questions(st.session_state["messages"][:-1]),
+                        )
+                        for _resp_chunk in run_response:
+                            # Display tool calls if available
+                            if hasattr(_resp_chunk, 'tools') and _resp_chunk.tools and len(_resp_chunk.tools) > 0:
+                                tools = _resp_chunk.tools
+                                display_tool_calls(tool_calls_container, _resp_chunk.tools)
+
+                            # Display response
+                            if hasattr(_resp_chunk, 'content') and _resp_chunk.content is not None:
+                                response += _resp_chunk.content
+                                resp_container.markdown(response)
 
                     # Add the complete response to message history
-                    tools = None
-                    if hasattr(cdp_agent, 'run_response') and hasattr(cdp_agent.run_response, 'tools'):
-                        tools = cdp_agent.run_response.tools
                     add_message("assistant", response, tools)
+                    logger.debug(f"Question coalescing: {question_flights.metrics()}")
                 except Exception as e:
                     error_message = f"""
                     <div class="error-message">
@@ -0,0 +1,224 @@
+"""Batch question answering for offline evaluation and cache priming.
+
+Reads questions from a JSONL file, answers them with bounded concurrency and
+writes one JSONL record per question with the answer, retrieved sources, token
+counts and per-stage latencies.
+
+Input lines look like:
+    {"id": "q1", "question": "How do I set up a new source?", "platform": "Segment"}
+``id`` defaults to the line number and ``platform`` is optional.
+
+Run with:
+    python batch.py questions.jsonl answers.jsonl --concurrency 4
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from agno.models.base import Model
+from agno.models.google import Gemini
+
+from agentic_rag import get_cdp_support_agent, get_knowledge_base
+from classifier import OFF_TOPIC_RESPONSE, question_classifier
+from retrieval import retrieval_trace, run_scoped
+
+
+def read_questions(path: str) -> List[Dict]:
+    """Read question records from a JSONL file, skipping blank lines.
+
+    Lines that are not a JSON object are kept as records carrying a
+    ``parse_error``, so they show up as failed results instead of stopping the run.
+    """
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record = {"parse_error": f"invalid JSON: {e}"}
+            if not isinstance(record, dict):
+                record = {"parse_error": "record is not a JSON object"}
+            record.setdefault("id", str(line_number))
+            questions.append(record)
+    return questions
+
+
+def _token_counts(metrics: Optional[Dict]) -> Dict[str, Optional[int]]:
+    counts = {}
+    for key in ("input_tokens", "output_tokens", "total_tokens"):
+        value = (metrics or {}).get(key)
+        if isinstance(value, list):
+            value = sum(v or 0 for v in value)
+        counts[key] = value
+    return counts
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def answer_question(
+    record: Dict, agent_kwargs: Dict, model_factory: Optional[Callable[[], Model]] = None
+) -> Dict:
+    """Answer one question record with a fresh agent and time each stage.
+
+    Each question gets its own agent, model and tools: agno binds the running
+    agent's functions and per-run state onto them, so they must not be shared
+    by agents running at the same time. Only the knowledge base and the API
+    client behind ``model_factory`` are shared. A malformed record is written
+    as an error result rather than stopping the batch.
+    """
+    result = {"id": record.get("id"), "question": record.get("question"), "platforms": []}
+    started = time.perf_counter()
+    classify_seconds = None
+    classification = None
+
+    trace: List[Dict] = []
+    first_token = None
+    answer = ""
+    run_response = None
+    try:
+        if record.get("parse_error"):
+            raise ValueError(record["parse_error"])
+        question = record.get("question")
+        if not isinstance(question, str) or not question.strip():
+            raise ValueError("record has no question text")
+        platform = record.get("platform")
+        # Same platform focus as the chat UI's platform filter
+        if platform and platform != "All Platforms":
+            if platform.lower() not in question.lower():
+                question = f"For {platform}: {question}"
+        result["question"] = question
+
+        classification = question_classifier.classify(question)
+        classify_seconds = time.perf_counter() - started
+        result["platforms"] = classification.platforms
+
+        if classification.off_topic:
+            answer = OFF_TOPIC_RESPONSE
+            first_token = time.perf_counter() - started
+        else:
+            model = model_factory() if model_factory is not None else None
+            agent = get_cdp_support_agent(
+                session_id=f"batch-{record['id']}", model=model, **agent_kwargs
+            )
+            token = retrieval_trace.set(trace)
+            try:
+                chunks = run_scoped(
+                    classification.platforms, lambda: agent.run(question, stream=True)
+                )
+                for chunk in chunks:
+                    if getattr(chunk, "content", None):
+                        if first_token is None:
+                            first_token = time.perf_counter() - started
+                        answer += chunk.content
+            finally:
+                retrieval_trace.reset(token)
+            run_response = agent.run_response
+        result["error"] = None
+    except Exception as e:
+        result["error"] = str(e)
+    total_seconds = time.perf_counter() - started
+
+    sources = []
+    for retrieval in trace:
+        for source in retrieval["sources"]:
+            if source and source not in sources:
+                sources.append(source)
+    tools = getattr(run_response, "tools", None) or []
+
+    result.update({
+        "answer": answer,
+        "off_topic": classification.off_topic if classification else None,
+        "sources": sources,
+        "tool_calls": [tool.get("tool_name", tool.get("name")) for tool in tools if isinstance(tool, dict)],
+        "tokens": _token_counts(getattr(run_response, "metrics", None)),
+        "latency_ms": {
+            "classify": _ms(classify_seconds),
+            "retrieval": _ms(sum(r["seconds"] for r in trace)) if trace else None,
+            "first_token": _ms(first_token),
+            "total": _ms(total_seconds),
+        },
+    })
+    return result
+
+
+def run_batch(
+    questions: List[Dict],
+    output_path: str,
+    concurrency: int = 4,
+    model_factory: Optional[Callable[[], Model]] = None,
+    **agent_kwargs,
+) -> Dict[str, int]:
+    """Answer ``questions`` with up to ``concurrency`` in flight, appending results as they finish.
+
+    Args:
+        model_factory: Builds the model for each question's agent. Defaults to a
+            new ``Gemini(id=model_id)`` per agent, all sharing one google-genai client
+
+    Returns:
+        Dict[str, int]: Count of answered and failed questions
+    """
+    # Build or load the shared index once, before the workers start
+    get_knowledge_base(
+        db_path=agent_kwargs.get("db_path", "./chroma_db"),
+        embeddings=agent_kwargs.get("embeddings"),
+    )
+    if model_factory is None:
+        # Only the HTTP client is shared; each agent gets its own Gemini model
+        model_id = agent_kwargs.get("model_id", "gemini-2.0-flash-exp")
+        client = Gemini(id=model_id).get_client()
+        model_factory = lambda: Gemini(id=model_id, client=client)
+    write_lock = threading.Lock()
+    summary = {"answered": 0, "failed": 0}
+    with open(output_path, "w", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(answer_question, record, agent_kwargs, model_factory)
+            for record in questions
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            with write_lock:
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+            summary["failed" if result["error"] else "answered"] += 1
+            print(f"[{summary['answered'] + summary['failed']}/{len(questions)}] "
+                  f"{result['id']}: {result['latency_ms']['total']} ms"
+                  + (f" (error: {result['error']})" if result["error"] else ""))
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of CDP questions")
+    parser.add_argument("input", help="JSONL file with one question record per line")
+    parser.add_argument("output", help="JSONL file to write results to")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Maximum number of questions answered at once")
+    parser.add_argument("--db-path", default="./chroma_db")
+    parser.add_argument("--model-id", default="gemini-2.0-flash-exp")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="Only answer the first N questions")
+    args = parser.parse_args()
+
+    load_dotenv()
+    questions = read_questions(args.input)[:args.limit]
+    summary = run_batch(
+        questions,
+        args.output,
+        concurrency=args.concurrency,
+        db_path=args.db_path,
+        model_id=args.model_id,
+    )
+    print(f"Done: {summary['answered']} answered, {summary['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import hashlib
+import re
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+OFF_TOPIC_RESPONSE = (
+    "As a CDP specialist, I focus on Segment, mParticle, Lytics, and Zeotap. I can't help "
+    "with that topic, but I'd be happy to help with any questions about managing customer "
+    "data or implementing CDP solutions."
+)
+
+# Platform rules keyed by the knowledge base source IDs. "segment" is also a
+# generic CDP term ("build an audience segment"), so the word only counts next
+# to Segment-specific context. Capitalized "Segment" counts inside a sentence,
+# but at the start of one it is usually the verb ("Segment my users by region")
+# and also needs context.
+PLATFORM_PATTERNS = {
+    "SEGMENT": [
+        re.compile(r"(?<=[^\s.!?] )Segment\b"),
+        re.compile(
+            r"(?:^|[.!?]\s+)Segment(?=\s*([,:?]|$)|\s+(vs\.?|versus|compared?|docs|documentation|workspaces?)\b)",
+            re.MULTILINE,
+        ),
+        re.compile(r"\bsegment(\.com|\.io|'s)", re.IGNORECASE),
+        re.compile(r"\b(in|with|from|to|twilio) segment\b(?! (of|for|by|based))", re.IGNORECASE),
+        re.compile(r"\b(analytics\.js|personas|segment protocols|segment engage|segment unify)\b", re.IGNORECASE),
+    ],
+    "MPARTICLE": [
+        re.compile(r"\bm-?particle\b", re.IGNORECASE),
+        re.compile(r"\bidsync\b", re.IGNORECASE),
+    ],
+    "LYTICS": [
+        re.compile(r"\blytics\b", re.IGNORECASE),
+        re.compile(r"\bjstag\b", re.IGNORECASE),
+    ],
+    "ZEOTAP": [
+        re.compile(r"\bzeotap\b", re.IGNORECASE),
+    ],
+}
+
+CDP_TERMS = re.compile(
+    r"\b(cdp|dmp|crm|etl|customer data|audiences?|segments?|segmentation|profiles?|identit(y|ies)|"
+    r"events?|track(ing)?|sources?|destinations?|integrat(e|ion|ions)|sdks?|apis?|schemas?|"
+    r"consent|gdpr|ccpa|data|pipelines?|warehouses?|webhooks?|attributes?|cohorts?|"
+    r"campaigns?|personali[sz]ation|users?|customers?|tags?|pixels?|analytics|onboard(ing)?|"
+    r"retargeting|ads|server-side|client-side|snowflake|bigquery|redshift|twilio)\b",
+    re.IGNORECASE,
+)
+
+OFF_TOPIC_TERMS = re.compile(
+    r"\b(movies?|films?|cinema|box office|weather|forecast|recipes?|cook(ing)?|bake|"
+    r"sports?|football|soccer|cricket|basketball|nba|nfl|songs?|music|lyrics|celebrit(y|ies)|"
+    r"jokes?|poems?|horoscope|zodiac|vacation|holiday|restaurants?|dating|"
+    r"president|election|lottery)\b",
+    re.IGNORECASE,
+)
+
+_SEED_EXAMPLES = {
+    "cdp": [
+        "how do i set up a new source",
+        "how can i create a user profile",
+        "how do i build an audience",
+        "how can i integrate my data",
+        "configure identity resolution for my use case",
+        "send events to a destination",
+        "track page views with the sdk",
+        "export audiences to an ad platform",
+        "set up consent management for gdpr",
+        "what is the api rate limit for ingestion",
+        "what is the difference between these two platforms",
+        "what is the release process for a new version",
+        "can you explain how this feature works",
+    ],
+    "off_topic": [
+        "when is the next movie release",
+        "what is the weather tomorrow",
+        "give me a recipe for pasta",
+        "who won the football match",
+        "tell me a joke",
+        "write a poem about the sea",
+        "what is my horoscope today",
+        "recommend a good restaurant nearby",
+        "what songs are trending this week",
+        "plan my vacation itinerary",
+    ],
+}
+
+
+class Classification(NamedTuple):
+    platforms: List[str]
+    off_topic: bool
+    reason: str
+
+
+class QuestionClassifier:
+    """Cheap local pre-classifier run before the agent.
+
+    Keyword/regex rules detect which platforms a question concerns and flag
+    clearly off-topic questions. Questions no rule matches can optionally be
+    scored by a small hashed bag-of-words model against seed examples; it only
+    declares a question off-topic with a clear margin, and otherwise leaves the
+    decision to the agent.
+
+    Args:
+        use_model: Score questions no rule matched with the vectorized model
+        dim: Hashed feature dimension of the model
+        margin: Minimum cosine margin for the model to call a question off-topic
+    """
+
+    def __init__(self, use_model: bool = True, dim: int = 1024, margin: float = 0.25):
+        self.use_model = use_model
+        self.dim = dim
+        self.margin = margin
+        self._centroids = None
+        if use_model:
+            self._centroids = {
+                label: self._normalize(self._vectorize_many(examples).mean(axis=0))
+                for label, examples in _SEED_EXAMPLES.items()
+            }
+
+    def detect_platforms(self, question: str) -> List[str]:
+        """Return the source IDs of the platforms a question mentions."""
+        return [
+            platform
+            for platform, patterns in PLATFORM_PATTERNS.items()
+            if any(pattern.search(question) for pattern in patterns)
+        ]
+
+    def classify(self, question: str, history: Optional[Sequence[str]] = None) -> Classification:
+        """Classify a question as platform-specific, general CDP or off-topic.
+
+        Args:
+            question: The question to classify
+            history: Earlier user questions in the same conversation, oldest
+                first. A question that would otherwise be off-topic is treated
+                as a follow-up when any of them was about CDPs, e.g. "How would
+                this work for a music streaming app?", and keeps the platform
+                scope of the most recent platform-specific one.
+        """
+        classification = self._classify(question)
+        if not classification.off_topic or not history:
+            return classification
+        previous = [self._classify(turn) for turn in history]
+        if all(turn.off_topic for turn in previous):
+            return classification
+        platforms = next((turn.platforms for turn in reversed(previous) if turn.platforms), [])
+        return Classification(platforms, False, "follow_up")
+
+    def _classify(self, question: str) -> Classification:
+        platforms = self.detect_platforms(question)
+        if platforms:
+            return Classification(platforms, False, "platform")
+        if CDP_TERMS.search(question):
+            return Classification([], False, "cdp_terms")
+        if OFF_TOPIC_TERMS.search(question):
+            return Classification([], True, "off_topic_terms")
+        if self._centroids is not None:
+            vector = self._normalize(self._vectorize_many([question])[0])
+            off_topic = float(vector @ self._centroids["off_topic"])
+            cdp = float(vector @ self._centroids["cdp"])
+            if off_topic - cdp >= self.margin:
+                return Classification([], True, "model")
+        return Classification([], False, "undecided")
+
+    def _vectorize_many(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = re.findall(r"[a-z0-9]+", text.lower())
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                digest = hashlib.md5(feature.encode("utf-8")).digest()
+                matrix[row, int.from_bytes(digest[:4], "little") % self.dim] += 1.0
+        return matrix
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+# Process-wide instance; classification is stateless
+question_classifier = QuestionClassifier()
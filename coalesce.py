@@ -0,0 +1,164 @@
+import re
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from agno.utils.log import logger
+
+
+def normalize_question(question: str) -> str:
+    """Normalize a question so trivially different phrasings share a key.
+
+    Args:
+        question: Raw question text as typed or clicked by the user
+
+    Returns:
+        str: Lower-cased question with collapsed whitespace and no trailing punctuation
+    """
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?!.")
+
+
+class _Flight:
+    """A single in-flight generation shared by every caller with the same key."""
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+        self.cond = threading.Condition()
+
+
+class SingleFlight:
+    """Coalesce concurrent identical streaming calls into one generation.
+
+    The first caller for a key becomes the leader: its generator is driven on a
+    background thread and every chunk is buffered. Callers arriving while the
+    flight is still running attach to it, replay the chunks produced so far and
+    then follow the live stream. If the leader fails before its followers have
+    seen any output, one of them is elected to lead a single retry.
+    """
+
+    def __init__(self, wait_timeout: Optional[float] = 120.0):
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._flights: Dict[Tuple[str, str], _Flight] = {}
+        self._metrics = {"leaders": 0, "coalesced": 0, "reelections": 0, "errors": 0}
+
+    def metrics(self) -> Dict[str, int]:
+        """Return a snapshot of the coalescing counters.
+
+        ``coalesced`` counts answers delivered from another caller's generation.
+        """
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["in_flight"] = len(self._flights)
+        return snapshot
+
+    def stream(
+        self,
+        question: str,
+        platform: str,
+        run: Callable[[], Iterator[Any]],
+        on_shared: Optional[Callable[[List[Any]], None]] = None,
+    ) -> Iterator[Any]:
+        """Stream chunks for a question, sharing generation with identical calls.
+
+        Args:
+            question: The user question
+            platform: Selected platform, part of the coalescing key
+            run: Zero-argument callable returning the chunk iterator for this caller,
+                e.g. ``lambda: agent.run(question, stream=True)``
+            on_shared: Called with every chunk when this caller was a follower and
+                the shared generation completed, so the caller can record a run
+                its own agent never made
+
+        Yields:
+            Chunks produced by the leader's generation
+        """
+        key = (normalize_question(question), platform)
+        yield from self._stream(key, run, on_shared, retry=True)
+
+    def _stream(
+        self,
+        key: Tuple[str, str],
+        run: Callable[[], Iterator[Any]],
+        on_shared: Optional[Callable[[List[Any]], None]],
+        retry: bool,
+    ) -> Iterator[Any]:
+        with self._lock:
+            flight = self._flights.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                self._metrics["leaders"] += 1
+                if not retry:
+                    self._metrics["reelections"] += 1
+            flight.waiters += 1
+
+        if is_leader:
+            threading.Thread(
+                target=self._produce, args=(key, flight, run), daemon=True
+            ).start()
+        else:
+            logger.debug(f"Coalescing request onto in-flight generation: {key}")
+
+        yielded = 0
+        try:
+            while True:
+                with flight.cond:
+                    while yielded >= len(flight.chunks) and not flight.done:
+                        if not flight.cond.wait(timeout=self.wait_timeout):
+                            raise TimeoutError("Timed out waiting for shared generation")
+                    pending = flight.chunks[yielded:]
+                    done, error = flight.done, flight.error
+                for chunk in pending:
+                    yield chunk
+                yielded += len(pending)
+                if done and yielded >= len(flight.chunks):
+                    break
+        finally:
+            with flight.cond:
+                flight.waiters -= 1
+
+        if error is None:
+            if not is_leader:
+                # Counted only once a shared answer was actually delivered, so
+                # callers re-attaching after a re-election are not counted twice
+                with self._lock:
+                    self._metrics["coalesced"] += 1
+                if on_shared is not None:
+                    on_shared(list(flight.chunks))
+            return
+        if is_leader or yielded > 0 or not retry:
+            raise error
+
+        # The leader failed before producing output. The failed flight is already
+        # detached, so the first follower to get here leads a new one and the
+        # others attach to it instead of each running its own generation.
+        logger.warning(f"Shared generation failed ({error}); re-electing a leader")
+        yield from self._stream(key, run, on_shared, retry=False)
+
+    def _produce(self, key: Tuple[str, str], flight: _Flight, run: Callable[[], Iterator[Any]]):
+        try:
+            for chunk in run():
+                with flight.cond:
+                    flight.chunks.append(chunk)
+                    flight.cond.notify_all()
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self._metrics["errors"] += 1
+        finally:
+            # Detach before marking done so late arrivals start a fresh flight
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            with flight.cond:
+                flight.done = True
+                flight.cond.notify_all()
+
+
+# Process-wide instance shared by every Streamlit session
+question_flights = SingleFlight()
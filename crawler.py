@@ -0,0 +1,243 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+from collections import deque
+from typing import Dict, List, Optional
+from urllib.parse import urldefrag, urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from langchain_core.documents import Document
+
+
+class PageCache:
+    """Compressed on-disk cache of raw crawled pages and their validators.
+
+    Each URL is stored as a gzip-compressed body plus a small JSON sidecar holding
+    the ETag / Last-Modified headers used for conditional requests.
+    """
+
+    def __init__(self, cache_dir: str = "./page_cache"):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url: str, suffix: str) -> str:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Return the cached entry for a URL (metadata plus ``body``), or None."""
+        meta_path, body_path = self._path(url, ".json"), self._path(url, ".html.gz")
+        if not (os.path.exists(meta_path) and os.path.exists(body_path)):
+            return None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            with gzip.open(body_path, "rt", encoding="utf-8") as f:
+                entry["body"] = f.read()
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def put(self, url: str, body: str, headers: Dict[str, str]):
+        """Store a page body and its caching headers, replacing any previous entry."""
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "content_type": headers.get("Content-Type", ""),
+            "fetched_at": time.time(),
+        }
+        body_path, meta_path = self._path(url, ".html.gz"), self._path(url, ".json")
+        with gzip.open(body_path + ".tmp", "wt", encoding="utf-8") as f:
+            f.write(body)
+        os.replace(body_path + ".tmp", body_path)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+
+class Fetcher:
+    """HTTP fetch layer with pooled keep-alive sessions and conditional GETs.
+
+    Args:
+        cache: Page cache used for conditional requests and offline replay
+        offline: Serve pages only from the cache, never touching the network
+        pool_size: Maximum pooled connections kept per host
+        timeout: Per-request timeout in seconds
+        max_retries: Retries for connection errors and 5xx responses
+    """
+
+    def __init__(
+        self,
+        cache: Optional[PageCache] = None,
+        offline: bool = False,
+        pool_size: int = 8,
+        timeout: float = 15.0,
+        max_retries: int = 2,
+    ):
+        self.cache = cache or PageCache()
+        self.offline = offline
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._sessions: Dict[str, requests.Session] = {}
+        self.stats = {"fetched": 0, "not_modified": 0, "cache_only": 0, "errors": 0}
+
+    def _session(self, url: str) -> requests.Session:
+        host = urlparse(url).netloc
+        session = self._sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            retry = Retry(
+                total=self.max_retries,
+                backoff_factor=0.5,
+                status_forcelist=(500, 502, 503, 504),
+            )
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = "cdp-support-assistant-crawler"
+            self._sessions[host] = session
+        return session
+
+    def fetch(self, url: str) -> Optional[Dict]:
+        """Fetch a page, revalidating any cached copy.
+
+        Returns:
+            Optional[Dict]: Entry with ``url``, ``body`` and ``content_type``,
+                or None if the page is unavailable
+        """
+        cached = self.cache.get(url)
+        if self.offline:
+            if cached is not None:
+                self.stats["cache_only"] += 1
+            return cached
+
+        headers = {}
+        if cached is not None:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            response = self._session(url).get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"Error fetching {url}: {str(e)}")
+            self.stats["errors"] += 1
+            return cached
+
+        if response.status_code == 304 and cached is not None:
+            self.stats["not_modified"] += 1
+            return cached
+        if response.status_code != 200:
+            # e.g. 429 or 403: keep serving the copy we already have
+            print(f"Error fetching {url}: HTTP {response.status_code}")
+            self.stats["errors"] += 1
+            return cached
+
+        self.stats["fetched"] += 1
+        content_type = response.headers.get("Content-Type", "")
+        if not is_text_content(content_type):
+            # Binary bodies are neither cached nor indexed
+            return {"url": url, "body": "", "content_type": content_type}
+        self.cache.put(url, response.text, response.headers)
+        return {
+            "url": url,
+            "body": response.text,
+            "content_type": content_type,
+        }
+
+    def close(self):
+        """Close all pooled sessions."""
+        for session in self._sessions.values():
+            session.close()
+        self._sessions.clear()
+
+
+_HREF_RE = re.compile(r"""href=["']([^"'#][^"']*)["']""", re.IGNORECASE)
+_TITLE_RE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+
+# Same asset types RecursiveUrlLoader skips when following links
+SUFFIXES_TO_IGNORE = (
+    ".css", ".js", ".ico", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp",
+    ".csv", ".bz2", ".zip", ".gz", ".tar", ".epub", ".pdf", ".docx", ".xlsx",
+    ".pptx", ".mp3", ".mp4", ".woff", ".woff2", ".ttf", ".eot", ".json", ".xml",
+)
+
+
+def is_text_content(content_type: str) -> bool:
+    """Whether a Content-Type is an HTML or other text page worth indexing."""
+    content_type = content_type.lower()
+    return "html" in content_type or content_type.startswith("text/")
+
+
+def _extract_links(base_url: str, page_url: str, html: str) -> List[str]:
+    links = []
+    for href in _HREF_RE.findall(html):
+        link, _ = urldefrag(urljoin(page_url, href.strip()))
+        parsed = urlparse(link)
+        if parsed.scheme not in ("http", "https"):
+            continue
+        if parsed.path.lower().endswith(SUFFIXES_TO_IGNORE):
+            continue
+        if link.startswith(base_url):
+            links.append(link)
+    return links
+
+
+def crawl_site(
+    url: str,
+    fetcher: Fetcher,
+    max_depth: int = 2,
+    max_pages: Optional[int] = None,
+) -> List[Document]:
+    """Breadth-first crawl of a documentation site, staying under ``url``.
+
+    Mirrors the defaults of ``RecursiveUrlLoader`` (depth 2, raw HTML content)
+    but routes every request through the pooled, caching ``Fetcher``.
+
+    Args:
+        url: Root URL; only links under its directory are followed
+        fetcher: Fetch layer to use
+        max_depth: Maximum link depth from the root (root is depth 1)
+        max_pages: Optional cap on the number of pages loaded
+
+    Returns:
+        List[Document]: One document per fetched HTML or text page
+    """
+    parsed = urlparse(url)
+    base_url = f"{parsed.scheme}://{parsed.netloc}{parsed.path.rsplit('/', 1)[0]}/"
+    seen = {url}
+    queue = deque([(url, 1)])
+    documents = []
+
+    while queue:
+        if max_pages is not None and len(documents) >= max_pages:
+            break
+        page_url, depth = queue.popleft()
+        page = fetcher.fetch(page_url)
+        if page is None or not is_text_content(page.get("content_type", "")):
+            continue
+
+        html = page["body"]
+        title = _TITLE_RE.search(html)
+        metadata = {"source": page_url, "content_type": page.get("content_type", "")}
+        if title:
+            metadata["title"] = title.group(1).strip()
+        documents.append(Document(page_content=html, metadata=metadata))
+
+        if depth < max_depth and "html" in metadata["content_type"]:
+            for link in _extract_links(base_url, page_url, html):
+                if link not in seen:
+                    seen.add(link)
+                    queue.append((link, depth + 1))
+
+    return documents
@@ -0,0 +1,282 @@
+"""Out-of-process knowledge base refresh.
+
+Builds a fresh, versioned Chroma collection in the background and atomically
+switches the serving pointer to it once it is fully populated. Live agents read
+through ``retrieval.VersionedRetriever`` and pick up the new version on their
+next query.
+
+Run with:
+    python index_refresh.py --db-path ./chroma_db
+"""
+import argparse
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import chromadb
+from dotenv import load_dotenv
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from crawler import Fetcher, PageCache, crawl_site
+from vector_backends import HNSWParams
+
+COLLECTION_PREFIX = "CustomerSupport"
+POINTER_FILE = "active_collection.json"
+# Activated collection names remembered in the pointer file
+MAX_HISTORY = 20
+
+DEFAULT_URLS = {
+    "SEGMENT": "https://segment.com/docs/?ref=nav",
+    "MPARTICLE": "https://docs.mparticle.com/",
+    "LYTICS": "https://docs.lytics.com/",
+    "ZEOTAP": "https://docs.zeotap.com/home/en-us/"
+}
+
+
+def default_embeddings() -> Embeddings:
+    return GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+
+
+def load_documents(
+    urls: Dict[str, str],
+    page_cache_dir: str = "./page_cache",
+    offline_crawl: bool = False,
+) -> List[Document]:
+    """Crawl the documentation sites and split them into chunks.
+
+    Args:
+        urls: Dictionary mapping source IDs to root URLs
+        page_cache_dir: Directory of the compressed raw page cache
+        offline_crawl: Replay pages from the cache without network requests
+
+    Returns:
+        List[Document]: Chunks tagged with their ``source_id``
+    """
+    fetcher = Fetcher(cache=PageCache(page_cache_dir), offline=offline_crawl)
+    documents = []
+    for id, url in urls.items():
+        try:
+            docs = crawl_site(url, fetcher)
+            for doc in docs:
+                doc.metadata['source_id'] = id
+            documents.extend(docs)
+            print(f"Successfully loaded {id}")
+        except Exception as e:
+            print(f"Error loading {id}: {str(e)}")
+    fetcher.close()
+    print(f"Crawl stats: {fetcher.stats}")
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=4096, chunk_overlap=50
+    )
+
+    print(f"Processing {len(documents)} documents...")
+    docs = text_splitter.split_documents(documents)
+    print(f"Created {len(docs)} chunks")
+    return docs
+
+
+def build_collection(
+    documents: List[Document],
+    embeddings: Embeddings,
+    db_path: str = "./chroma_db",
+    collection_name: Optional[str] = None,
+    hnsw: Optional[HNSWParams] = None,
+) -> str:
+    """Populate a new versioned collection without touching the serving one.
+
+    If populating the collection fails (e.g. an embedding quota error), the
+    partial collection is deleted before the error is re-raised.
+
+    Args:
+        hnsw: HNSW index settings for the new collection; Chroma's defaults if None
+
+    Returns:
+        str: Name of the newly built collection
+    """
+    if collection_name is None:
+        # The random suffix keeps two builds started in the same second apart
+        collection_name = (
+            f"{COLLECTION_PREFIX}_v{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        )
+    client = chromadb.PersistentClient(path=db_path)
+    # create_collection (not get-or-create) so a name clash fails instead of
+    # mixing two builds into one collection
+    client.create_collection(
+        collection_name, metadata=(hnsw or HNSWParams()).collection_metadata()
+    )
+    vectorstore = Chroma(
+        client=client,
+        collection_name=collection_name,
+        embedding_function=embeddings,
+    )
+    print(f"Adding documents to {collection_name}...")
+    try:
+        vectorstore.add_documents(documents)
+    except BaseException:
+        print(f"Building {collection_name} failed; deleting it")
+        client.delete_collection(collection_name)
+        raise
+    print("Documents added successfully")
+    return collection_name
+
+
+def _collection_names(client) -> List[str]:
+    return [c if isinstance(c, str) else c.name for c in client.list_collections()]
+
+
+def legacy_collection_count(db_path: str = "./chroma_db") -> int:
+    """Count documents in the pre-versioning collection without creating it."""
+    client = chromadb.PersistentClient(path=db_path)
+    if COLLECTION_PREFIX not in _collection_names(client):
+        return 0
+    return client.get_collection(COLLECTION_PREFIX).count()
+
+
+def _read_pointer(db_path: str) -> Dict:
+    try:
+        with open(os.path.join(db_path, POINTER_FILE), "r", encoding="utf-8") as f:
+            pointer = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return pointer if isinstance(pointer, dict) else {}
+
+
+def read_active_collection(db_path: str = "./chroma_db") -> Optional[str]:
+    """Return the name of the collection currently being served, if any."""
+    return _read_pointer(db_path).get("collection")
+
+
+def activated_collections(db_path: str = "./chroma_db") -> List[str]:
+    """Names of the collections that have been served, most recent last."""
+    pointer = _read_pointer(db_path)
+    history = list(pointer.get("history") or [])
+    active = pointer.get("collection")
+    if active and active not in history:
+        history.append(active)
+    return history
+
+
+def activate_collection(collection_name: str, db_path: str = "./chroma_db"):
+    """Atomically point serving at ``collection_name``."""
+    os.makedirs(db_path, exist_ok=True)
+    history = [name for name in activated_collections(db_path) if name != collection_name]
+    history = (history + [collection_name])[-MAX_HISTORY:]
+    pointer_path = os.path.join(db_path, POINTER_FILE)
+    with open(pointer_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(
+            {"collection": collection_name, "activated_at": time.time(), "history": history}, f
+        )
+    os.replace(pointer_path + ".tmp", pointer_path)
+    print(f"Serving collection is now {collection_name}")
+
+
+def garbage_collect(db_path: str = "./chroma_db", keep: int = 2) -> List[str]:
+    """Delete old versioned collections, keeping the newest ``keep`` and the active one.
+
+    The previous version is kept by default so queries already in flight against
+    it can finish after a swap. Versions newer than the active one that were
+    never activated are leftovers of failed builds and are always deleted, so
+    they cannot push good versions out of ``keep``. The pre-versioning
+    collection is deleted once it is no longer the active one.
+
+    Only one refresh worker should run per database: a build still in progress
+    elsewhere looks the same as a failed one.
+
+    Returns:
+        List[str]: Names of the deleted collections
+    """
+    active = read_active_collection(db_path)
+    activated = set(activated_collections(db_path))
+    client = chromadb.PersistentClient(path=db_path)
+    names = _collection_names(client)
+    versions = sorted(n for n in names if n.startswith(f"{COLLECTION_PREFIX}_v"))
+    abandoned = [
+        n for n in versions
+        if active is not None and n > active and n not in activated
+    ]
+    versions = [n for n in versions if n not in abandoned]
+    candidates = abandoned + list(versions[:-keep] if keep > 0 else versions)
+    if COLLECTION_PREFIX in names:
+        candidates.append(COLLECTION_PREFIX)
+    deleted = []
+    for name in candidates:
+        if name != active:
+            client.delete_collection(name)
+            deleted.append(name)
+    if deleted:
+        print(f"Deleted old collections: {', '.join(deleted)}")
+    return deleted
+
+
+def refresh_index(
+    db_path: str = "./chroma_db",
+    urls: Optional[Dict[str, str]] = None,
+    embeddings: Optional[Embeddings] = None,
+    page_cache_dir: str = "./page_cache",
+    offline_crawl: bool = False,
+    keep: int = 2,
+    hnsw: Optional[HNSWParams] = None,
+) -> Optional[str]:
+    """Build a new collection version, swap it in and collect old versions.
+
+    Returns:
+        Optional[str]: The new collection name, or None if nothing was loaded
+            and the serving collection was left untouched
+    """
+    documents = load_documents(urls or DEFAULT_URLS, page_cache_dir, offline_crawl)
+    if not documents:
+        print("No documents loaded; keeping the current collection")
+        return None
+    collection_name = build_collection(
+        documents, embeddings or default_embeddings(), db_path, hnsw=hnsw
+    )
+    activate_collection(collection_name, db_path)
+    garbage_collect(db_path, keep=keep)
+    return collection_name
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the CDP documentation index")
+    parser.add_argument("--db-path", default="./chroma_db")
+    parser.add_argument("--page-cache-dir", default="./page_cache")
+    parser.add_argument("--offline", action="store_true",
+                        help="Rebuild from the page cache without network requests")
+    parser.add_argument("--keep", type=int, default=2,
+                        help="Number of collection versions to keep")
+    parser.add_argument("--interval", type=float, default=None,
+                        help="Refresh every N seconds instead of once")
+    defaults = HNSWParams()
+    parser.add_argument("--hnsw-m", type=int, default=defaults.M)
+    parser.add_argument("--hnsw-ef-construction", type=int, default=defaults.ef_construction)
+    parser.add_argument("--hnsw-ef-search", type=int, default=defaults.ef_search)
+    args = parser.parse_args()
+
+    load_dotenv()
+    while True:
+        try:
+            refresh_index(
+                db_path=args.db_path,
+                page_cache_dir=args.page_cache_dir,
+                offline_crawl=args.offline,
+                keep=args.keep,
+                hnsw=HNSWParams(args.hnsw_m, args.hnsw_ef_construction, args.hnsw_ef_search),
+            )
+        except Exception as e:
+            print(f"Index refresh failed: {str(e)}")
+            if args.interval is None:
+                raise
+        if args.interval is None:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""Concurrent-user load test for the CDP Support Assistant.
+
+Drives N simulated chat sessions through the same code path the Streamlit app
+uses (``app.initialize_agent`` and ``app.generate_response``), with Gemini and
+the embedder replaced by local fakes, so the numbers reflect this process's own
+overhead rather than API latency.
+
+Run with:
+    python loadtest.py --sessions 1,2,4,8,16,32 --turns 2 --token-latency 0.02
+
+Concurrent sessions asking the same opening question share one generation
+(see ``coalesce.py``), which flatters the numbers; pass ``--no-coalesce`` or
+``--distinct-questions`` to measure every answer being generated.
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import resource
+import shutil
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from agno.models.google import Gemini
+
+import app
+from coalesce import question_flights
+from index_refresh import activate_collection, build_collection
+
+SAMPLE_QUESTIONS = [
+    "How do I set up a new source in Segment?",
+    "How can I create a user profile in mParticle?",
+    "How do I build an audience segment in Lytics?",
+    "How can I integrate my data with Zeotap?",
+    "How does Segment's audience creation process compare to Lytics'?",
+    "What are the differences between mParticle and Zeotap for data integration?",
+]
+
+FAKE_ANSWER = (
+    "# How to complete this task\n\n## Overview\nThis is a simulated answer used for "
+    "load testing. It walks through prerequisites, detailed steps, validation and "
+    "troubleshooting so that the streamed response has a realistic length. "
+) * 8
+
+
+class _Stub(SimpleNamespace):
+    """Response object that returns None for any field it was not given."""
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return None
+
+
+class FakeGeminiClient:
+    """Stands in for ``google.genai.Client`` and streams a canned answer.
+
+    Args:
+        first_token_latency: Seconds before the first chunk is produced
+        token_latency: Seconds between subsequent chunks
+        tokens_per_chunk: Whitespace-separated tokens sent per chunk
+    """
+
+    def __init__(self, first_token_latency: float = 0.5, token_latency: float = 0.02,
+                 tokens_per_chunk: int = 4):
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.tokens_per_chunk = tokens_per_chunk
+        self.models = self
+
+    @staticmethod
+    def _response(text: str) -> _Stub:
+        part = _Stub(text=text)
+        tokens = len(text.split())
+        usage = _Stub(prompt_token_count=0, candidates_token_count=tokens, total_token_count=tokens)
+        return _Stub(
+            candidates=[_Stub(content=_Stub(role="model", parts=[part]))],
+            usage_metadata=usage,
+        )
+
+    def generate_content_stream(self, model=None, contents=None, **kwargs):
+        time.sleep(self.first_token_latency)
+        tokens = FAKE_ANSWER.split(" ")
+        for i in range(0, len(tokens), self.tokens_per_chunk):
+            if i:
+                time.sleep(self.token_latency)
+            yield self._response(" ".join(tokens[i:i + self.tokens_per_chunk]) + " ")
+
+    def generate_content(self, model=None, contents=None, **kwargs):
+        time.sleep(self.first_token_latency)
+        return self._response(FAKE_ANSWER)
+
+
+def fake_gemini(**client_kwargs) -> Gemini:
+    """Build a Gemini model backed by ``FakeGeminiClient``."""
+    return Gemini(id="gemini-2.0-flash-exp", client=FakeGeminiClient(**client_kwargs))
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic hashed bag-of-words embeddings, no network access."""
+
+    def __init__(self, dim: int = 256, latency: float = 0.0):
+        self.dim = dim
+        self.latency = latency
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        for token in text.lower().split():
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dim] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._embed(text)
+
+
+def seed_index(db_path: str, embeddings: Embeddings, num_chunks: int = 500):
+    """Build and activate a synthetic collection so no crawling is needed."""
+    platforms = ["SEGMENT", "MPARTICLE", "LYTICS", "ZEOTAP"]
+    documents = [
+        Document(
+            page_content=f"{platforms[i % 4].title()} documentation chunk {i}: "
+            f"sources destinations audiences profiles identity integration step {i % 37}",
+            metadata={"source": f"https://example.com/{i}", "source_id": platforms[i % 4]},
+        )
+        for i in range(num_chunks)
+    ]
+    activate_collection(build_collection(documents, embeddings, db_path), db_path)
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+def session_question(index: int, turn: int, distinct: bool = False) -> str:
+    """Question asked by session ``index`` on ``turn``.
+
+    With ``distinct`` every session asks its own wording, so no two concurrent
+    questions can be coalesced.
+    """
+    question = SAMPLE_QUESTIONS[(index + turn) % len(SAMPLE_QUESTIONS)]
+    if distinct:
+        question = f"{question} (session {index}, turn {turn})"
+    return question
+
+
+def run_session(index: int, turns: int, start: threading.Barrier, agent_kwargs: Dict,
+                client_kwargs: Dict, results: List[Dict], sessions: List[Dict],
+                coalesce: bool = True, distinct_questions: bool = False):
+    """Simulate one browser session: create its agent, then ask ``turns`` questions."""
+    session_state = app.init_session_state({})
+    sessions.append(session_state)
+    start.wait()
+    agent_kwargs = dict(agent_kwargs, model=fake_gemini(**client_kwargs))
+    app.initialize_agent(
+        debug_mode=False,
+        show_tool_calls=True,
+        session_state=session_state,
+        **agent_kwargs,
+    )
+    for turn in range(turns):
+        question = session_question(index, turn, distinct_questions)
+        session_state["messages"].append({"role": "user", "content": question})
+        started = time.perf_counter()
+        first_token = None
+        response = ""
+        error = None
+        try:
+            with app.lease_agent(
+                debug_mode=False,
+                show_tool_calls=True,
+                session_state=session_state,
+                **agent_kwargs,
+            ) as cdp_agent:
+                for chunk in app.generate_response(
+                    cdp_agent,
+                    question,
+                    session_state["selected_platform"],
+                    coalesce=coalesce and len(session_state["messages"]) == 1,
+                    history=app.user_questions(session_state["messages"][:-1]),
+                ):
+                    if getattr(chunk, "content", None):
+                        if first_token is None:
+                            first_token = time.perf_counter() - started
+                        response += chunk.content
+        except Exception as e:
+            error = str(e)
+        session_state["messages"].append({"role": "assistant", "content": response})
+        results.append({
+            "session": index,
+            "turn": turn,
+            "ttft": first_token,
+            "total": time.perf_counter() - started,
+            "error": error,
+        })
+
+
+def run_level(num_sessions: int, turns: int, agent_kwargs: Dict, client_kwargs: Dict,
+              coalesce: bool = True, distinct_questions: bool = False) -> Dict:
+    """Run ``num_sessions`` concurrent sessions and summarize the results.
+
+    ``coalesced`` in the summary counts answers that were shared from another
+    session's generation rather than generated for this one.
+    """
+    results: List[Dict] = []
+    sessions: List[Dict] = []
+    start = threading.Barrier(num_sessions + 1)
+    threads = [
+        threading.Thread(
+            target=run_session,
+            args=(i, turns, start, agent_kwargs, client_kwargs, results, sessions,
+                  coalesce, distinct_questions),
+        )
+        for i in range(num_sessions)
+    ]
+    coalesced_before = question_flights.metrics()["coalesced"]
+    rss_before = current_rss()
+    for thread in threads:
+        thread.start()
+    start.wait()
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - wall_start
+    rss_after = current_rss()
+    coalesced = question_flights.metrics()["coalesced"] - coalesced_before
+
+    ttfts = [r["ttft"] for r in results if r["ttft"] is not None]
+    completed = [r for r in results if r["error"] is None]
+    summary = {
+        "sessions": num_sessions,
+        "answers": len(completed),
+        "errors": len(results) - len(completed),
+        "coalesced": coalesced,
+        "wall_s": wall,
+        "throughput_per_s": len(completed) / wall if wall else 0.0,
+        "ttft_p50_s": percentile(ttfts, 50),
+        "ttft_p95_s": percentile(ttfts, 95),
+        "ttft_p99_s": percentile(ttfts, 99),
+        "rss_per_session_mb": (rss_after - rss_before) / num_sessions / 2**20,
+        "retained_kb_per_session": app.agent_pool.stats()["live_bytes"] / num_sessions / 1024,
+    }
+    # Agents stay pooled until RSS has been sampled, then the sessions end
+    for session_state in sessions:
+        app.agent_pool.release(session_state["session_id"])
+    return summary
+
+
+def find_saturation(levels: List[Dict], min_gain: float = 1.1, max_ttft_growth: float = 2.0) -> Optional[int]:
+    """Return the first session count where adding sessions stops paying off.
+
+    Saturation is the first level whose throughput grew by less than ``min_gain``
+    over the previous level, or whose p95 time to first token exceeds
+    ``max_ttft_growth`` times that of the first level.
+    """
+    baseline_ttft = levels[0]["ttft_p95_s"] if levels else None
+    for previous, level in zip(levels, levels[1:]):
+        if previous["throughput_per_s"] and level["throughput_per_s"] < previous["throughput_per_s"] * min_gain:
+            return level["sessions"]
+        if baseline_ttft and level["ttft_p95_s"] and level["ttft_p95_s"] > baseline_ttft * max_ttft_growth:
+            return level["sessions"]
+    return None
+
+
+def _fmt(value: Optional[float], unit: str = "") -> str:
+    return "-" if value is None else f"{value:.3f}{unit}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the CDP Support Assistant")
+    parser.add_argument("--sessions", default="1,2,4,8,16,32",
+                        help="Comma-separated concurrent session counts to try")
+    parser.add_argument("--turns", type=int, default=2, help="Questions per session")
+    parser.add_argument("--first-token-latency", type=float, default=0.5)
+    parser.add_argument("--token-latency", type=float, default=0.02)
+    parser.add_argument("--embed-latency", type=float, default=0.0)
+    parser.add_argument("--chunks", type=int, default=500, help="Synthetic index size")
+    parser.add_argument("--no-coalesce", action="store_true",
+                        help="Generate every answer instead of sharing identical opening questions")
+    parser.add_argument("--distinct-questions", action="store_true",
+                        help="Give every session its own question wording")
+    parser.add_argument("--json", default=None, help="Also write the report to this file")
+    args = parser.parse_args()
+
+    # TavilyTools refuses to start without a key; the fake model never calls it
+    os.environ.setdefault("TAVILY_API_KEY", "load-test")
+
+    db_path = tempfile.mkdtemp(prefix="cdp_load_test_")
+    try:
+        embeddings = FakeEmbeddings(latency=args.embed_latency)
+        seed_index(db_path, embeddings, num_chunks=args.chunks)
+        agent_kwargs = {"db_path": db_path, "embeddings": embeddings}
+        client_kwargs = {
+            "first_token_latency": args.first_token_latency,
+            "token_latency": args.token_latency,
+        }
+
+        levels = []
+        print(f"{'sessions':>8} {'answers/s':>10} {'ttft p50':>9} {'ttft p95':>9} "
+              f"{'ttft p99':>9} {'MB/sess':>8} {'shared':>6} {'errors':>6}")
+        for num_sessions in [int(n) for n in args.sessions.split(",")]:
+            level = run_level(
+                num_sessions, args.turns, agent_kwargs, client_kwargs,
+                coalesce=not args.no_coalesce, distinct_questions=args.distinct_questions,
+            )
+            levels.append(level)
+            print(f"{level['sessions']:>8} {level['throughput_per_s']:>10.2f} "
+                  f"{_fmt(level['ttft_p50_s']):>9} {_fmt(level['ttft_p95_s']):>9} "
+                  f"{_fmt(level['ttft_p99_s']):>9} {level['rss_per_session_mb']:>8.2f} "
+                  f"{level['coalesced']:>6} {level['errors']:>6}")
+
+        saturation = find_saturation(levels)
+        if saturation is None:
+            print("No saturation observed in the tested range")
+        else:
+            print(f"Saturation begins at {saturation} concurrent sessions")
+
+        print(f"Question coalescing: {question_flights.metrics()}")
+
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"levels": levels, "saturation_sessions": saturation}, f, indent=2)
+    finally:
+        shutil.rmtree(db_path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Retrieval used by the agents: scoping, tracing and the versioned retriever.
+
+Queries always go to the collection the serving pointer names (see
+``index_refresh.py``), can be restricted to the platforms a question concerns
+with ``run_scoped`` and report their latency and sources to ``retrieval_trace``.
+"""
+import contextvars
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+from langchain_chroma import Chroma
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from pydantic import PrivateAttr
+
+from index_refresh import POINTER_FILE, read_active_collection
+from vector_backends import DEFAULT_BACKEND, VectorBackend, open_backend
+
+
+# Source IDs retrieval is restricted to for the current question, if any
+retrieval_scope: contextvars.ContextVar[Optional[List[str]]] = contextvars.ContextVar(
+    "retrieval_scope", default=None
+)
+
+
+# When set to a list, every retrieval made in this context appends its latency
+# and sources to it; used for per-stage timings in batch runs
+retrieval_trace: contextvars.ContextVar[Optional[List[Dict]]] = contextvars.ContextVar(
+    "retrieval_trace", default=None
+)
+
+
+def run_scoped(platforms: Optional[List[str]], run: Callable[[], Iterator]) -> Iterator:
+    """Iterate ``run()`` with retrieval restricted to ``platforms``.
+
+    Every step of the iterator executes inside a private context, so the scope
+    follows the generation onto whichever thread consumes it and never leaks
+    into the caller.
+    """
+    context = contextvars.copy_context()
+    context.run(retrieval_scope.set, platforms or None)
+    iterator = context.run(run)
+    while True:
+        try:
+            chunk = context.run(next, iterator)
+        except StopIteration:
+            return
+        yield chunk
+
+
+class VersionedRetriever(BaseRetriever):
+    """Retriever that always queries the collection named by the serving pointer.
+
+    The pointer file is re-checked (by mtime) on every query, so a swap made by
+    the refresh worker is picked up without restarting the app. Each version is
+    searched through a vector backend chosen by ``backend`` (see
+    ``vector_backends.open_backend``). Queries made under ``run_scoped`` are
+    filtered to the scoped platforms' documents, falling back to the whole
+    collection if that finds nothing.
+    """
+
+    db_path: str = "./chroma_db"
+    embeddings: Embeddings
+    k: int = 4
+    backend: str = DEFAULT_BACKEND
+    exact_threshold: Optional[int] = None
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _pointer_mtime: Optional[float] = PrivateAttr(default=None)
+    _collection_name: Optional[str] = PrivateAttr(default=None)
+    _backend: Optional[VectorBackend] = PrivateAttr(default=None)
+
+    def _current_backend(self) -> Optional[VectorBackend]:
+        try:
+            mtime = os.stat(os.path.join(self.db_path, POINTER_FILE)).st_mtime
+        except OSError:
+            return self._backend
+        with self._lock:
+            if mtime != self._pointer_mtime:
+                self._pointer_mtime = mtime
+                name = read_active_collection(self.db_path)
+                if name and name != self._collection_name:
+                    vectorstore = Chroma(
+                        collection_name=name,
+                        embedding_function=self.embeddings,
+                        persist_directory=self.db_path,
+                    )
+                    self._backend = open_backend(vectorstore, self.backend, self.exact_threshold)
+                    self._collection_name = name
+                    print(f"Serving {name} with the {self._backend.name} backend")
+            return self._backend
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        started = time.perf_counter()
+        backend = self._current_backend()
+        if backend is None:
+            return []
+        embedding = self.embeddings.embed_query(query)
+        scope = retrieval_scope.get()
+        documents = backend.search(embedding, k=self.k, source_ids=scope) if scope else []
+        if not documents:
+            documents = backend.search(embedding, k=self.k)
+
+        trace = retrieval_trace.get()
+        if trace is not None:
+            trace.append({
+                "seconds": time.perf_counter() - started,
+                "sources": [doc.metadata.get("source") for doc in documents],
+            })
+        return documents
@@ -0,0 +1,279 @@
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+from agno.agent import Agent, AgentMemory
+from agno.memory.agent import AgentRun
+from agno.run.response import RunResponse
+from agno.utils.log import logger
+
+from agentic_rag import EXPECTED_OUTPUT, DESCRIPTION, INSTRUCTIONS, get_cdp_support_agent
+
+_SKIP_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def deep_sizeof(obj: Any, exclude: Optional[Set[int]] = None) -> int:
+    """Approximate the bytes retained by an object graph.
+
+    Args:
+        obj: Root object to measure
+        exclude: ids of objects shared across agents, which are not counted
+
+    Returns:
+        int: Sum of ``sys.getsizeof`` over every reachable object
+    """
+    seen = set(exclude or ())
+    stack = [obj]
+    total = 0
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _SKIP_TYPES):
+            continue
+        seen.add(id(current))
+        try:
+            total += sys.getsizeof(current)
+        except TypeError:
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif not isinstance(current, (str, bytes, bytearray, int, float)):
+            if hasattr(current, "__dict__"):
+                stack.append(vars(current))
+            for slot in getattr(type(current), "__slots__", ()):
+                if hasattr(current, slot):
+                    stack.append(getattr(current, slot))
+    return total
+
+
+def _slim_run(run: AgentRun) -> AgentRun:
+    """Reduce a run to its question and final answer, as read by ``get_chat_history``."""
+    response = run.response
+    if response is None or not response.messages:
+        return AgentRun(message=run.message)
+    question = next((m for m in response.messages if m.role == "user"), None)
+    answer = next(
+        (m for m in reversed(response.messages) if m.role in ("assistant", "model", "CHATBOT")), None
+    )
+    return AgentRun(
+        message=run.message,
+        response=RunResponse(
+            content=response.content,
+            run_id=response.run_id,
+            session_id=response.session_id,
+            messages=[m for m in (question, answer) if m is not None],
+        ),
+    )
+
+
+class _Entry:
+    def __init__(self, agent_kwargs: Dict[str, Any]):
+        self.agent_kwargs = agent_kwargs
+        self.agent: Optional[Agent] = None
+        self.runs: List[Any] = []
+        self.messages: List[Any] = []
+        self.size = 0
+        self.last_used = time.monotonic()
+        # Active leases; a leased agent is mid-response and is never hibernated
+        self.leases = 0
+        # Serializes building this session's agent without blocking the pool
+        self.build_lock = threading.Lock()
+
+
+class AgentPool:
+    """Process-wide owner of per-session agents with idle eviction.
+
+    Sessions keep only their session id; the pool keeps the agents. Agents that
+    have been idle longer than ``idle_ttl``, or that fall off the LRU end when
+    ``max_agents`` or ``max_bytes`` is exceeded, are hibernated: the agent is
+    dropped and its history is kept in slimmed form. The last
+    ``num_history_responses`` runs, which the agent feeds back into its prompt,
+    are kept whole; older runs keep only their question and final answer, which
+    is what the chat history tool reads; and the messages that made tool calls
+    are kept for the tool call history tool. Tool results, references and
+    system prompts of older runs are dropped. The next message rebuilds the
+    agent around the shared knowledge base and restores that history.
+
+    Agents are built and measured outside the pool lock, so a slow build only
+    holds up its own session. Streaming a response should happen inside
+    ``lease``, which keeps the agent from being hibernated until it finishes.
+
+    Args:
+        factory: Callable building an agent, called with ``session_id`` and the
+            keyword arguments first passed to ``get``
+        max_agents: Maximum number of live agents
+        max_bytes: Optional budget for the measured memory of all live agents
+        idle_ttl: Seconds of inactivity after which an agent is hibernated
+        max_hibernated: Maximum hibernated sessions kept before the oldest are dropped
+    """
+
+    def __init__(
+        self,
+        factory: Callable[..., Agent] = get_cdp_support_agent,
+        max_agents: int = 50,
+        max_bytes: Optional[int] = None,
+        idle_ttl: float = 900.0,
+        max_hibernated: int = 1000,
+    ):
+        self.factory = factory
+        self.max_agents = max_agents
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.max_hibernated = max_hibernated
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._counters = {"built": 0, "rebuilt": 0, "hibernated": 0, "dropped": 0}
+        # Objects every agent shares are not charged to any one session
+        self._shared_ids = {id(DESCRIPTION), id(INSTRUCTIONS), id(EXPECTED_OUTPUT)}
+
+    def get(self, session_id: str, **agent_kwargs) -> Agent:
+        """Return the live agent for a session, building or waking it if needed."""
+        return self._acquire(session_id, agent_kwargs, lease=False)
+
+    @contextmanager
+    def lease(self, session_id: str, **agent_kwargs) -> Iterator[Agent]:
+        """Hold a session's agent for the duration of a response.
+
+        The agent cannot be hibernated while any lease on it is open, so a
+        response that is still streaming always records its run in the agent
+        the session will use next.
+        """
+        agent = self._acquire(session_id, agent_kwargs, lease=True)
+        try:
+            yield agent
+        finally:
+            with self._lock:
+                entry = self._entries.get(session_id)
+                if entry is not None:
+                    entry.leases -= 1
+                    entry.last_used = time.monotonic()
+
+    def release(self, session_id: str):
+        """Forget a session entirely, e.g. when the user starts a new chat."""
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def _acquire(self, session_id: str, agent_kwargs: Dict[str, Any], lease: bool) -> Agent:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                entry = _Entry(agent_kwargs)
+                self._entries[session_id] = entry
+            self._entries.move_to_end(session_id)
+            if lease:
+                entry.leases += 1
+
+        try:
+            with entry.build_lock:
+                with self._lock:
+                    agent = entry.agent
+                    runs, messages = list(entry.runs), list(entry.messages)
+                if agent is None:
+                    agent = self._build(session_id, entry.agent_kwargs, runs, messages)
+                    with self._lock:
+                        entry.agent = agent
+                        entry.runs, entry.messages = [], []
+                        entry.last_used = time.monotonic()
+                        self._counters["rebuilt" if runs or messages else "built"] += 1
+            size = self.measure(agent)
+        except BaseException:
+            if lease:
+                with self._lock:
+                    entry.leases -= 1
+            raise
+
+        with self._lock:
+            entry.size = size
+            entry.last_used = time.monotonic()
+            self._enforce(keep=session_id)
+        return agent
+
+    def measure(self, agent: Agent) -> int:
+        """Approximate bytes of per-session state an agent retains.
+
+        Counts the run history and last run response, which grow with every
+        message; the model, tools and shared knowledge are a fixed cost per agent.
+        """
+        exclude = set(self._shared_ids)
+        if agent.knowledge is not None:
+            exclude.add(id(agent.knowledge))
+        retained = [getattr(agent, "memory", None), getattr(agent, "run_response", None)]
+        return deep_sizeof(retained, exclude=exclude)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool counters and per-session memory accounting."""
+        with self._lock:
+            live = {sid: e.size for sid, e in self._entries.items() if e.agent is not None}
+            return {
+                **self._counters,
+                "live": len(live),
+                "hibernated_sessions": len(self._entries) - len(live),
+                "live_bytes": sum(live.values()),
+                "bytes_per_session": live,
+            }
+
+    def _build(
+        self, session_id: str, agent_kwargs: Dict[str, Any], runs: List[Any], messages: List[Any]
+    ) -> Agent:
+        agent = self.factory(session_id=session_id, **agent_kwargs)
+        if runs or messages:
+            if getattr(agent, "memory", None) is None:
+                agent.memory = AgentMemory()
+            agent.memory.runs = list(runs)
+            agent.memory.messages = list(messages)
+        return agent
+
+    def _hibernate(self, session_id: str, entry: _Entry):
+        agent = entry.agent
+        memory = getattr(agent, "memory", None)
+        if memory is not None:
+            num_runs = max(agent.num_history_responses or 0, 0)
+            split = max(len(memory.runs) - num_runs, 0)
+            entry.runs = [_slim_run(run) for run in memory.runs[:split]] + list(memory.runs[split:])
+            entry.messages = [message for message in memory.messages if message.tool_calls]
+        entry.agent = None
+        entry.size = 0
+        self._counters["hibernated"] += 1
+        logger.debug(f"Hibernated agent for session {session_id}")
+
+    def _enforce(self, keep: str):
+        now = time.monotonic()
+        evictable = [
+            (sid, e) for sid, e in self._entries.items()
+            if e.agent is not None and e.leases == 0 and sid != keep
+        ]
+
+        for sid, entry in evictable:
+            if now - entry.last_used >= self.idle_ttl:
+                self._hibernate(sid, entry)
+
+        # Entries are in LRU order, oldest first
+        evictable = [(sid, e) for sid, e in evictable if e.agent is not None]
+        live_count = sum(1 for e in self._entries.values() if e.agent is not None)
+        live_bytes = sum(e.size for e in self._entries.values() if e.agent is not None)
+        for sid, entry in evictable:
+            over_count = live_count > self.max_agents
+            over_bytes = self.max_bytes is not None and live_bytes > self.max_bytes
+            if not (over_count or over_bytes):
+                break
+            live_bytes -= entry.size
+            live_count -= 1
+            self._hibernate(sid, entry)
+
+        hibernated = [
+            sid for sid, e in self._entries.items()
+            if e.agent is None and e.leases == 0 and not e.build_lock.locked() and sid != keep
+        ]
+        for sid in hibernated[:max(0, len(hibernated) - self.max_hibernated)]:
+            del self._entries[sid]
+            self._counters["dropped"] += 1
+
+
+# Process-wide pool shared by every Streamlit session
+agent_pool = AgentPool()
@@ -0,0 +1,71 @@
+import json
+import threading
+from types import SimpleNamespace
+
+import batch
+
+
+class _Agent:
+    def __init__(self, model):
+        self.model = model
+        self.run_response = None
+
+    def run(self, question, stream=True):
+        self.run_response = SimpleNamespace(tools=None, metrics={"total_tokens": [3]})
+        yield SimpleNamespace(content=f"answer to {question}")
+
+
+def _record_agents(monkeypatch):
+    agents = []
+    lock = threading.Lock()
+
+    def get_cdp_support_agent(session_id=None, model=None, **kwargs):
+        agent = _Agent(model)
+        with lock:
+            agents.append(agent)
+        return agent
+
+    monkeypatch.setattr(batch, "get_cdp_support_agent", get_cdp_support_agent)
+    monkeypatch.setattr(batch, "get_knowledge_base", lambda **kwargs: None)
+    return agents
+
+
+def test_read_questions_keeps_bad_lines_as_errors(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    path.write_text(
+        '{"id": "q1", "question": "How do I track events?"}\n'
+        "\n"
+        "not json\n"
+        '["a list"]\n'
+        '{"question": "What is a CDP?"}\n'
+    )
+    records = batch.read_questions(str(path))
+    assert [r["id"] for r in records] == ["q1", "3", "4", "5"]
+    assert "parse_error" in records[1] and "parse_error" in records[2]
+
+
+def test_malformed_records_are_reported_not_raised(monkeypatch):
+    agents = _record_agents(monkeypatch)
+    for record in ({"id": "1"}, {"id": "2", "question": "  "}, {"id": "3", "parse_error": "invalid JSON"}):
+        result = batch.answer_question(record, {})
+        assert result["error"]
+        assert result["answer"] == ""
+    assert agents == []
+
+
+def test_each_agent_gets_its_own_model(monkeypatch, tmp_path):
+    agents = _record_agents(monkeypatch)
+    questions = [
+        {"id": str(i), "question": f"How do I set up source {i} in Segment?"} for i in range(6)
+    ] + [{"id": "bad"}]
+    output = tmp_path / "answers.jsonl"
+
+    summary = batch.run_batch(questions, str(output), concurrency=3, model_factory=object)
+
+    assert summary == {"answered": 6, "failed": 1}
+    assert len(agents) == 6
+    assert len({id(agent.model) for agent in agents}) == 6
+    results = {r["id"]: r for r in map(json.loads, output.read_text().splitlines())}
+    assert results["0"]["platforms"] == ["SEGMENT"]
+    assert results["0"]["tokens"]["total_tokens"] == 3
+    assert results["bad"]["error"] == "record has no question text"
@@ -0,0 +1,77 @@
+import pytest
+
+from classifier import QuestionClassifier
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return QuestionClassifier()
+
+
+@pytest.mark.parametrize("question, platforms", [
+    ("How do I set up a new source in Segment?", ["SEGMENT"]),
+    ("What is Segment?", ["SEGMENT"]),
+    ("Segment vs mParticle for identity resolution", ["SEGMENT", "MPARTICLE"]),
+    ("Segment's audience builder", ["SEGMENT"]),
+    ("Compare Lytics, Segment and Zeotap", ["SEGMENT", "LYTICS", "ZEOTAP"]),
+    ("How do I use analytics.js?", ["SEGMENT"]),
+    ("Configure IDSync rules", ["MPARTICLE"]),
+    ("How can I create a user profile in m-particle?", ["MPARTICLE"]),
+    ("Where do I install the jstag?", ["LYTICS"]),
+    ("How can I integrate my data with Zeotap?", ["ZEOTAP"]),
+    # "segment" as a generic CDP word or a verb is not the platform
+    ("How do I build an audience segment?", []),
+    ("Segment my users by region in Lytics", ["LYTICS"]),
+    ("Segment customers by lifetime value", []),
+    ("What is a segment of users?", []),
+])
+def test_detect_platforms(classifier, question, platforms):
+    assert classifier.detect_platforms(question) == platforms
+
+
+@pytest.mark.parametrize("question, reason", [
+    ("How do I set up a new source in Segment?", "platform"),
+    ("What is a DMP?", "cdp_terms"),
+    ("How do I build an audience?", "cdp_terms"),
+    ("When is the next movie release?", "off_topic_terms"),
+    ("Tell me a joke", "off_topic_terms"),
+])
+def test_classify_reason(classifier, question, reason):
+    classification = classifier.classify(question)
+    assert classification.reason == reason
+    assert classification.off_topic == reason.startswith("off_topic")
+
+
+@pytest.mark.parametrize("question", [
+    "How would this work for a music streaming app?",
+    "Can you give an example for a restaurant chain?",
+    "What if my business sells movie tickets?",
+    "How do I handle holiday traffic?",
+])
+def test_follow_up_in_cdp_conversation_is_not_off_topic(classifier, question):
+    assert classifier.classify(question).off_topic
+
+    history = ["How do I build an audience segment in Lytics?", "Thanks!"]
+    classification = classifier.classify(question, history=history)
+    assert not classification.off_topic
+    assert classification.reason == "follow_up"
+    # Retrieval stays scoped to the platform the conversation was about
+    assert classification.platforms == ["LYTICS"]
+
+
+def test_follow_up_keeps_most_recent_platform_scope(classifier):
+    history = ["How do I set up a new source in Segment?", "And what about Zeotap?"]
+    classification = classifier.classify("What if my business sells movie tickets?", history=history)
+    assert classification.platforms == ["ZEOTAP"]
+
+
+def test_off_topic_conversation_stays_off_topic(classifier):
+    history = ["Tell me a joke", "What is the weather tomorrow?"]
+    assert classifier.classify("Recommend a restaurant", history=history).off_topic
+
+
+def test_on_topic_question_ignores_history(classifier):
+    history = ["How do I build an audience segment in Lytics?"]
+    classification = classifier.classify("How do I track events in mParticle?", history=history)
+    assert classification.platforms == ["MPARTICLE"]
+    assert classification.reason == "platform"
@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+
+from coalesce import SingleFlight, normalize_question
+
+
+def _gated_run(gate, chunks, calls, fail=False):
+    """Build a ``run`` callable that waits on ``gate`` before streaming ``chunks``."""
+
+    def run():
+        calls.append(1)
+        gate.wait(5)
+        if fail:
+            raise RuntimeError("generation failed")
+        for chunk in chunks:
+            yield chunk
+
+    return run
+
+
+def _consume(flights, question, run, results, on_shared=None):
+    try:
+        results.append(list(flights.stream(question, "All Platforms", run, on_shared=on_shared)))
+    except Exception as e:
+        results.append(e)
+
+
+def _wait_for_waiters(flights, count):
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        flight = next(iter(flights._flights.values()), None)
+        if flight is not None and flight.waiters >= count:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"expected {count} callers on the flight")
+
+
+def test_normalize_question():
+    assert normalize_question("  How do I  set up a Source?? ") == "how do i set up a source"
+
+
+def test_followers_replay_the_leaders_chunks():
+    flights = SingleFlight()
+    gate, calls, results = threading.Event(), [], []
+    threads = [
+        threading.Thread(
+            target=_consume,
+            args=(flights, question, _gated_run(gate, ["a", "b", "c"], calls), results),
+        )
+        for question in ("What is a CDP?", "what is a cdp", "What is a CDP")
+    ]
+    threads[0].start()
+    _wait_for_waiters(flights, 1)
+    for thread in threads[1:]:
+        thread.start()
+    _wait_for_waiters(flights, 3)
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [["a", "b", "c"]] * 3
+    metrics = flights.metrics()
+    assert (metrics["leaders"], metrics["coalesced"], metrics["in_flight"]) == (1, 2, 0)
+
+
+def test_on_shared_is_called_only_for_followers():
+    flights = SingleFlight()
+    gate, calls, results, shared = threading.Event(), [], [], []
+    run = _gated_run(gate, ["x", "y"], calls)
+    leader = threading.Thread(
+        target=_consume, args=(flights, "q", run, results, lambda c: shared.append(("leader", c)))
+    )
+    follower = threading.Thread(
+        target=_consume, args=(flights, "q", run, results, lambda c: shared.append(("follower", c)))
+    )
+    leader.start()
+    _wait_for_waiters(flights, 1)
+    follower.start()
+    _wait_for_waiters(flights, 2)
+    gate.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert shared == [("follower", ["x", "y"])]
+
+
+def test_leader_failure_reelects_a_single_leader():
+    flights = SingleFlight()
+    failing_gate, retry_gate = threading.Event(), threading.Event()
+    failed_calls, retry_calls, results = [], [], []
+    failing = _gated_run(failing_gate, [], failed_calls, fail=True)
+    retry = _gated_run(retry_gate, ["ok"], retry_calls)
+
+    leader = threading.Thread(target=_consume, args=(flights, "q", failing, results))
+    leader.start()
+    _wait_for_waiters(flights, 1)
+    followers = [threading.Thread(target=_consume, args=(flights, "q", retry, results)) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    _wait_for_waiters(flights, 4)
+    failing_gate.set()
+    leader.join(5)
+    # One follower leads the retry and the other two attach to it
+    _wait_for_waiters(flights, 3)
+    retry_gate.set()
+    for thread in followers:
+        thread.join(5)
+
+    assert len(failed_calls) == 1
+    assert len(retry_calls) == 1
+    assert sum(isinstance(r, RuntimeError) for r in results) == 1
+    assert sorted(r for r in results if isinstance(r, list)) == [["ok"]] * 3
+    metrics = flights.metrics()
+    assert metrics["reelections"] == 1
+    assert metrics["leaders"] == 2
+    assert metrics["coalesced"] == 2
+    assert metrics["errors"] == 1
+
+
+def test_followers_time_out_waiting_for_a_stalled_leader():
+    flights = SingleFlight(wait_timeout=0.2)
+    gate, calls, results = threading.Event(), [], []
+    run = _gated_run(gate, ["late"], calls)
+
+    with pytest.raises(TimeoutError):
+        list(flights.stream("q", "All Platforms", run))
+    gate.set()
@@ -0,0 +1,162 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from crawler import Fetcher, PageCache, crawl_site
+
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+PAGES = {
+    "/docs/": (
+        "text/html",
+        '<html><head><title>Docs Home</title><link href="/docs/style.css" rel="stylesheet">'
+        '</head><body><a href="/docs/a.html">A</a> <a href="/docs/logo.png">logo</a> '
+        '<a href="mailto:help@example.com">mail</a> <a href="/outside/x.html">outside</a>'
+        ' <a href="/docs/download">download</a></body></html>',
+    ),
+    "/docs/a.html": (
+        "text/html; charset=utf-8",
+        '<html><head><title>Page A</title></head><body><a href="/docs/b.html">B</a></body></html>',
+    ),
+    "/docs/b.html": ("text/html", "<html><head><title>Page B</title></head></html>"),
+    "/docs/style.css": ("text/css", "body { color: red; }"),
+    "/docs/logo.png": ("image/png", "\x89PNG"),
+    "/docs/download": ("application/octet-stream", "\x00\x01binary"),
+    "/outside/x.html": ("text/html", "<html>outside</html>"),
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.client_address, self.headers.get("If-None-Match")))
+        if self.server.status is not None:
+            self.send_response(self.server.status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path not in PAGES:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        content_type, body = PAGES[self.path]
+        etag = f'"{hash(body) & 0xffffffff:x}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        payload = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.requests = []
+    httpd.status = None
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _root(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/docs/"
+
+
+def _paths(server):
+    return [path for path, _, _ in server.requests]
+
+
+def test_crawl_skips_assets_and_non_html_pages(server, tmp_path):
+    fetcher = Fetcher(cache=PageCache(str(tmp_path)))
+    docs = crawl_site(_root(server), fetcher, max_depth=2)
+    fetcher.close()
+
+    # Stylesheets, images, mailto: and off-root links are never requested;
+    # the binary download is fetched but not indexed or cached
+    assert _paths(server) == ["/docs/", "/docs/a.html", "/docs/download"]
+    assert [d.metadata["title"] for d in docs] == ["Docs Home", "Page A"]
+    assert PageCache(str(tmp_path)).get(_root(server) + "download") is None
+
+
+def test_depth_limit(server, tmp_path):
+    fetcher = Fetcher(cache=PageCache(str(tmp_path)))
+    assert len(crawl_site(_root(server), fetcher, max_depth=1)) == 1
+    assert len(crawl_site(_root(server), fetcher, max_depth=3)) == 3
+    fetcher.close()
+
+
+def test_connections_are_reused_per_host(server, tmp_path):
+    fetcher = Fetcher(cache=PageCache(str(tmp_path)))
+    crawl_site(_root(server), fetcher, max_depth=3)
+    fetcher.close()
+
+    assert len(server.requests) == 4
+    assert len({client for _, client, _ in server.requests}) == 1
+
+
+def test_conditional_get_revalidates_cached_pages(server, tmp_path):
+    cache = PageCache(str(tmp_path))
+    first = Fetcher(cache=cache)
+    crawl_site(_root(server), first, max_depth=2)
+    first.close()
+    assert first.stats["fetched"] == 3
+
+    second = Fetcher(cache=cache)
+    docs = crawl_site(_root(server), second, max_depth=2)
+    second.close()
+
+    # The uncached binary download is fetched again; both pages revalidate
+    assert second.stats == {"fetched": 1, "not_modified": 2, "cache_only": 0, "errors": 0}
+    revalidated = [path for path, _, etag in server.requests[3:] if etag]
+    assert revalidated == ["/docs/", "/docs/a.html"]
+    assert [d.metadata["title"] for d in docs] == ["Docs Home", "Page A"]
+
+
+def test_offline_replay_from_cache(server, tmp_path):
+    cache = PageCache(str(tmp_path))
+    online = Fetcher(cache=cache)
+    expected = crawl_site(_root(server), online, max_depth=2)
+    online.close()
+    requests_made = len(server.requests)
+
+    offline = Fetcher(cache=cache, offline=True)
+    replayed = crawl_site(_root(server), offline, max_depth=2)
+
+    assert len(server.requests) == requests_made
+    assert offline.stats["cache_only"] == 2
+    assert [d.page_content for d in replayed] == [d.page_content for d in expected]
+
+
+@pytest.mark.parametrize("status", [403, 429])
+def test_error_status_serves_cached_copy(server, tmp_path, status):
+    cache = PageCache(str(tmp_path))
+    online = Fetcher(cache=cache)
+    expected = crawl_site(_root(server), online, max_depth=2)
+    online.close()
+
+    server.status = status
+    refused = Fetcher(cache=cache, max_retries=0)
+    docs = crawl_site(_root(server), refused, max_depth=2)
+    refused.close()
+
+    assert [d.page_content for d in docs] == [d.page_content for d in expected]
+    # Both cached pages survive; the never-cached download is simply missing
+    assert refused.stats["errors"] == 3
+    assert refused.stats["fetched"] == 0
@@ -0,0 +1,106 @@
+import chromadb
+import pytest
+from chromadb.errors import ChromaError
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from index_refresh import (
+    COLLECTION_PREFIX,
+    activate_collection,
+    activated_collections,
+    build_collection,
+    garbage_collect,
+    legacy_collection_count,
+    read_active_collection,
+)
+
+
+class _Embeddings(Embeddings):
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+
+    def embed_documents(self, texts):
+        if self.fail_after is not None and len(texts) > self.fail_after:
+            raise RuntimeError("quota exceeded")
+        return [[float(len(text)), 1.0, 0.0] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0, 0.0]
+
+
+DOCUMENTS = [Document(page_content=f"chunk {i}", metadata={"source_id": "SEGMENT"}) for i in range(3)]
+
+
+def _collections(db_path):
+    return sorted(c.name for c in chromadb.PersistentClient(path=db_path).list_collections())
+
+
+def _version(db_path, stamp):
+    return build_collection(DOCUMENTS, _Embeddings(), db_path, f"{COLLECTION_PREFIX}_v{stamp}")
+
+
+def test_build_collection_names_are_unique(tmp_path):
+    db_path = str(tmp_path)
+    first = build_collection(DOCUMENTS, _Embeddings(), db_path)
+    second = build_collection(DOCUMENTS, _Embeddings(), db_path)
+    assert first != second
+    with pytest.raises(ChromaError):
+        build_collection(DOCUMENTS, _Embeddings(), db_path, collection_name=first)
+
+
+def test_failed_build_deletes_partial_collection(tmp_path):
+    db_path = str(tmp_path)
+    with pytest.raises(RuntimeError):
+        build_collection(DOCUMENTS, _Embeddings(fail_after=1), db_path)
+    assert _collections(db_path) == []
+
+
+def test_legacy_check_does_not_create_collection(tmp_path):
+    db_path = str(tmp_path)
+    assert legacy_collection_count(db_path) == 0
+    assert _collections(db_path) == []
+
+
+def test_activation_history(tmp_path):
+    db_path = str(tmp_path)
+    activate_collection("a", db_path)
+    activate_collection("b", db_path)
+    activate_collection("a", db_path)
+    assert read_active_collection(db_path) == "a"
+    assert activated_collections(db_path) == ["b", "a"]
+
+
+def test_garbage_collect_keeps_newest_activated_versions(tmp_path):
+    db_path = str(tmp_path)
+    names = [_version(db_path, stamp) for stamp in ("1", "2", "3")]
+    for name in names:
+        activate_collection(name, db_path)
+
+    assert garbage_collect(db_path, keep=2) == [names[0]]
+    assert _collections(db_path) == names[1:]
+
+
+def test_garbage_collect_drops_never_activated_newer_versions(tmp_path):
+    db_path = str(tmp_path)
+    good = [_version(db_path, stamp) for stamp in ("1", "2")]
+    for name in good:
+        activate_collection(name, db_path)
+    # Left behind by builds that never got activated
+    abandoned = [_version(db_path, stamp) for stamp in ("3", "4")]
+
+    deleted = garbage_collect(db_path, keep=2)
+
+    assert sorted(deleted) == abandoned
+    assert _collections(db_path) == good
+
+
+def test_garbage_collect_deletes_inactive_legacy_collection(tmp_path):
+    db_path = str(tmp_path)
+    build_collection(DOCUMENTS, _Embeddings(), db_path, COLLECTION_PREFIX)
+    activate_collection(COLLECTION_PREFIX, db_path)
+    assert garbage_collect(db_path) == []
+
+    version = _version(db_path, "1")
+    activate_collection(version, db_path)
+    assert garbage_collect(db_path) == [COLLECTION_PREFIX]
+    assert _collections(db_path) == [version]
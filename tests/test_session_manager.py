@@ -0,0 +1,126 @@
+import threading
+import time
+
+from agno.agent import Agent, AgentMemory
+from agno.memory.agent import AgentRun
+from agno.models.message import Message
+from agno.run.response import RunResponse
+
+from session_manager import AgentPool
+
+
+def _factory(session_id, delay=0.0, **kwargs):
+    if delay:
+        time.sleep(delay)
+    return Agent(session_id=session_id, memory=AgentMemory(), num_history_responses=3)
+
+
+def _add_run(agent, index, padding=0):
+    """Record a run with a tool call, as agno does after answering a question."""
+    user = Message(role="user", content=f"question {index}" + " x" * padding)
+    tool_request = Message(
+        role="assistant",
+        tool_calls=[{"id": f"call-{index}", "type": "function",
+                     "function": {"name": "search_knowledge_base", "arguments": "{}"}}],
+    )
+    tool_result = Message(role="tool", content=f"references {index}", tool_call_id=f"call-{index}")
+    answer = Message(role="assistant", content=f"answer {index}")
+    messages = [Message(role="system", content="instructions"), user, tool_request, tool_result, answer]
+    agent.memory.add_messages(messages=messages)
+    agent.memory.add_run(AgentRun(
+        message=user,
+        response=RunResponse(content=answer.content, session_id=agent.session_id, messages=messages),
+    ))
+
+
+def _live(pool):
+    return sorted(pool.stats()["bytes_per_session"])
+
+
+def test_hibernated_agent_is_rebuilt_with_its_history():
+    pool = AgentPool(factory=_factory, max_agents=1)
+    agent = pool.get("a")
+    for index in range(5):
+        _add_run(agent, index)
+
+    pool.get("b")
+    assert _live(pool) == ["b"]
+
+    rebuilt = pool.get("a")
+    assert rebuilt is not agent
+    runs = rebuilt.memory.runs
+    assert len(runs) == 5
+    # The runs fed back into the prompt are whole, older ones keep question and answer
+    assert [len(run.response.messages) for run in runs] == [2, 2, 5, 5, 5]
+    assert [(q.content, a.content) for q, a in rebuilt.memory.get_message_pairs()] == [
+        (f"question {i}", f"answer {i}") for i in range(5)
+    ]
+    assert [call["id"] for call in rebuilt.memory.get_tool_calls()] == [f"call-{i}" for i in range(4, -1, -1)]
+    assert pool.stats()["rebuilt"] == 1
+
+
+def test_least_recently_used_agent_is_hibernated_first():
+    pool = AgentPool(factory=_factory, max_agents=2)
+    for session_id in ("a", "b", "c"):
+        pool.get(session_id)
+    assert _live(pool) == ["b", "c"]
+
+    pool.get("b")
+    pool.get("d")
+    assert _live(pool) == ["b", "d"]
+    assert pool.stats()["hibernated_sessions"] == 2
+
+
+def test_byte_budget_hibernates_least_recently_used():
+    pool = AgentPool(factory=_factory, max_agents=10)
+    big = pool.get("a")
+    _add_run(big, 0, padding=20000)
+    pool.get("a")
+    budget = pool.stats()["live_bytes"]
+
+    pool.max_bytes = budget
+    pool.get("b")
+    assert _live(pool) == ["b"]
+
+
+def test_idle_agents_are_hibernated():
+    pool = AgentPool(factory=_factory, idle_ttl=0.0)
+    pool.get("a")
+    pool.get("b")
+    assert _live(pool) == ["b"]
+
+
+def test_leased_agent_is_never_hibernated():
+    pool = AgentPool(factory=_factory, max_agents=1, idle_ttl=0.0)
+    with pool.lease("a") as agent:
+        pool.get("b")
+        pool.get("c")
+        assert "a" in _live(pool)
+        assert pool.get("a") is agent
+
+    pool.get("d")
+    assert _live(pool) == ["d"]
+
+
+def test_release_forgets_session():
+    pool = AgentPool(factory=_factory)
+    first = pool.get("a")
+    pool.release("a")
+    assert pool.get("a") is not first
+    assert pool.stats()["built"] == 2
+
+
+def test_slow_build_does_not_block_other_sessions():
+    pool = AgentPool(factory=_factory)
+    slow = threading.Thread(target=pool.get, args=("slow",), kwargs={"delay": 1.0})
+    slow.start()
+    time.sleep(0.1)
+
+    started = time.perf_counter()
+    pool.get("fast")
+    pool.release("fast")
+    elapsed = time.perf_counter() - started
+    slow.join()
+
+    assert elapsed < 0.5
+    assert _live(pool) == ["slow"]
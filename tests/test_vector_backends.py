@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from vector_backends import NumpyBackend, VectorBackend
+
+SOURCES = ["SEGMENT", "MPARTICLE", "LYTICS", "ZEOTAP"]
+
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(7)
+    vectors = rng.standard_normal((200, 16)).astype(np.float32)
+    metadatas = [{"source_id": SOURCES[i % 4], "index": i} for i in range(200)]
+    queries = rng.standard_normal((20, 16)).astype(np.float32)
+    return vectors, metadatas, queries
+
+
+def _brute_force(vectors, metadatas, query, k, source_ids=None):
+    distances = [
+        (float(np.sum((vector - query) ** 2)), i)
+        for i, vector in enumerate(vectors)
+        if not source_ids or metadatas[i]["source_id"] in source_ids
+    ]
+    return [i for _, i in sorted(distances)[:k]]
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        VectorBackend()
+
+
+def test_numpy_search_matches_brute_force(corpus):
+    vectors, metadatas, queries = corpus
+    backend = NumpyBackend(vectors, [str(i) for i in range(len(vectors))], metadatas)
+    for query in queries:
+        found = [doc.metadata["index"] for doc in backend.search(query, k=5)]
+        assert found == _brute_force(vectors, metadatas, query, 5)
+
+
+@pytest.mark.parametrize("source_ids", [["LYTICS"], ["SEGMENT", "ZEOTAP"]])
+def test_numpy_search_filters_by_source(corpus, source_ids):
+    vectors, metadatas, queries = corpus
+    backend = NumpyBackend(vectors, [str(i) for i in range(len(vectors))], metadatas)
+    for query in queries:
+        docs = backend.search(query, k=5, source_ids=source_ids)
+        assert all(doc.metadata["source_id"] in source_ids for doc in docs)
+        assert [doc.metadata["index"] for doc in docs] == _brute_force(
+            vectors, metadatas, query, 5, source_ids
+        )
+
+
+def test_numpy_search_returns_fewer_when_filter_matches_fewer(corpus):
+    vectors, metadatas, queries = corpus
+    metadatas = [dict(m, source_id="SEGMENT") for m in metadatas]
+    metadatas[3]["source_id"] = "LYTICS"
+    backend = NumpyBackend(vectors, [str(i) for i in range(len(vectors))], metadatas)
+    docs = backend.search(queries[0], k=4, source_ids=["LYTICS"])
+    assert [doc.metadata["index"] for doc in docs] == [3]
+
+
+def test_numpy_search_on_empty_collection():
+    backend = NumpyBackend(np.zeros((0, 0), dtype=np.float32), [], [])
+    assert backend.search([0.1, 0.2], k=4) == []
@@ -0,0 +1,364 @@
+"""Vector search backends behind ``VersionedRetriever``.
+
+``ChromaBackend`` queries the collection's HNSW index and is the default;
+``NumpyBackend`` loads the collection into memory once and answers with an
+exact matrix-multiply search, which can be faster for small corpora. The
+"auto" backend switches between them at an ``exact_threshold`` that should
+come from the benchmark below, run against the deployment's own collection.
+
+Run the benchmark with:
+    python vector_backends.py --db-path ./chroma_db
+    python vector_backends.py --sizes 1000,5000,20000,50000 --dim 768
+"""
+import argparse
+import json
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Dict, List, NamedTuple, Optional
+
+import chromadb
+import numpy as np
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+# HNSW search, so the collection's HNSWParams take effect unless the exact
+# backend is chosen explicitly or "auto" is given a benchmarked threshold
+DEFAULT_BACKEND = "chroma"
+
+
+class HNSWParams(NamedTuple):
+    """HNSW index settings, applied when a collection is created.
+
+    Defaults match Chroma's own. Larger ``M`` and ``ef_construction`` build a
+    better graph at higher build cost; larger ``ef_search`` trades query
+    latency for recall.
+    """
+
+    M: int = 16
+    ef_construction: int = 100
+    ef_search: int = 10
+
+    def collection_metadata(self) -> Dict[str, int]:
+        return {
+            "hnsw:space": "l2",
+            "hnsw:M": self.M,
+            "hnsw:construction_ef": self.ef_construction,
+            "hnsw:search_ef": self.ef_search,
+        }
+
+
+def _source_filter(source_ids: List[str]) -> Dict:
+    if len(source_ids) == 1:
+        return {"source_id": source_ids[0]}
+    return {"source_id": {"$in": list(source_ids)}}
+
+
+class VectorBackend(ABC):
+    """Nearest-neighbour search over one collection version."""
+
+    name = "base"
+
+    @abstractmethod
+    def search(
+        self, embedding: List[float], k: int = 4, source_ids: Optional[List[str]] = None
+    ) -> List[Document]:
+        """Return the ``k`` nearest documents, optionally restricted to ``source_ids``."""
+
+
+class ChromaBackend(VectorBackend):
+    """Approximate search through the collection's HNSW index."""
+
+    name = "chroma"
+
+    def __init__(self, vectorstore: Chroma):
+        self.vectorstore = vectorstore
+
+    def search(self, embedding, k=4, source_ids=None):
+        kwargs = {"filter": _source_filter(source_ids)} if source_ids else {}
+        return self.vectorstore.similarity_search_by_vector(embedding, k=k, **kwargs)
+
+
+class NumpyBackend(VectorBackend):
+    """Exact in-process search with one matrix multiply per query.
+
+    Ranks by squared L2 distance, the same metric as the Chroma collections,
+    so results match an exhaustive HNSW search.
+    """
+
+    name = "numpy"
+
+    def __init__(self, embeddings, documents: List[str], metadatas: List[Optional[Dict]]):
+        self.matrix = np.asarray(embeddings, dtype=np.float32)
+        self.norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+        self.documents = documents
+        self.metadatas = [m or {} for m in metadatas]
+        self.source_ids = np.array([m.get("source_id", "") for m in self.metadatas])
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore: Chroma) -> "NumpyBackend":
+        data = vectorstore._collection.get(include=["embeddings", "documents", "metadatas"])
+        embeddings = data["embeddings"]
+        if embeddings is None or len(embeddings) == 0:
+            embeddings = np.zeros((0, 0), dtype=np.float32)
+        return cls(embeddings, data["documents"], data["metadatas"])
+
+    def search(self, embedding, k=4, source_ids=None):
+        if len(self.documents) == 0:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        # ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2; the last term does not affect ranking
+        distances = self.norms - 2.0 * (self.matrix @ query)
+        if source_ids:
+            distances = np.where(np.isin(self.source_ids, source_ids), distances, np.inf)
+        k = min(k, len(distances))
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+        return [
+            Document(page_content=self.documents[i], metadata=self.metadatas[i])
+            for i in top
+            if np.isfinite(distances[i])
+        ]
+
+
+def open_backend(
+    vectorstore: Chroma, backend: str = DEFAULT_BACKEND, exact_threshold: Optional[int] = None
+) -> VectorBackend:
+    """Open a search backend for a collection.
+
+    Args:
+        vectorstore: Chroma store for the collection
+        backend: "chroma", "numpy", or "auto" to choose by collection size
+        exact_threshold: Largest collection "auto" searches with NumPy, e.g. the
+            ``recommended_threshold`` of a benchmark run; required for "auto"
+    """
+    if backend == "auto":
+        if exact_threshold is None:
+            raise ValueError(
+                "The auto vector backend needs an exact_threshold; "
+                "run `python vector_backends.py --db-path <path>` to measure one"
+            )
+        backend = "numpy" if vectorstore._collection.count() <= exact_threshold else "chroma"
+    if backend == "numpy":
+        return NumpyBackend.from_vectorstore(vectorstore)
+    if backend == "chroma":
+        return ChromaBackend(vectorstore)
+    raise ValueError(f"Unknown vector backend: {backend}")
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _compare(
+    exact: NumpyBackend,
+    collection,
+    queries: np.ndarray,
+    k: int,
+    min_recall: float,
+) -> Dict:
+    """Time exact and HNSW search for ``queries`` and pick the faster acceptable one."""
+    truth = [{d.page_content for d in exact.search(q, k)} for q in queries]
+
+    numpy_times = []
+    for q in queries:
+        started = time.perf_counter()
+        exact.search(q, k)
+        numpy_times.append(time.perf_counter() - started)
+
+    chroma_times, hits = [], 0
+    for q, expected in zip(queries, truth):
+        started = time.perf_counter()
+        result = collection.query(query_embeddings=[q.tolist()], n_results=k)
+        chroma_times.append(time.perf_counter() - started)
+        hits += len(expected & set(result["ids"][0]))
+
+    results = {
+        "numpy": {"p50_ms": _percentile(numpy_times, 50) * 1000,
+                  "p95_ms": _percentile(numpy_times, 95) * 1000, "recall": 1.0},
+        "chroma": {"p50_ms": _percentile(chroma_times, 50) * 1000,
+                   "p95_ms": _percentile(chroma_times, 95) * 1000,
+                   "recall": hits / (len(queries) * k)},
+    }
+    eligible = [name for name, r in results.items() if r["recall"] >= min_recall]
+    best = min(eligible, key=lambda name: results[name]["p50_ms"])
+    return {"best": best, **results}
+
+
+def _add_in_batches(collection, ids: List[str], vectors, batch: int = 5000):
+    for start in range(0, len(ids), batch):
+        collection.add(
+            ids=ids[start:start + batch],
+            embeddings=np.asarray(vectors[start:start + batch]).tolist(),
+            documents=ids[start:start + batch],
+        )
+
+
+def benchmark_backends(
+    sizes: List[int],
+    dim: int = 768,
+    num_queries: int = 100,
+    k: int = 4,
+    hnsw: Optional[HNSWParams] = None,
+    min_recall: float = 0.95,
+    seed: int = 0,
+) -> List[Dict]:
+    """Compare backends on synthetic corpora of each size.
+
+    For every size, measures p50/p95 query latency and recall@k against exact
+    search, and picks the fastest backend whose recall is at least ``min_recall``.
+    Random Gaussian vectors are harder for HNSW than real embeddings, so prefer
+    ``benchmark_collection`` when an index exists.
+
+    Returns:
+        List[Dict]: One result row per corpus size
+    """
+    hnsw = hnsw or HNSWParams()
+    rng = np.random.default_rng(seed)
+    client = chromadb.EphemeralClient()
+    rows = []
+    for size in sizes:
+        vectors = rng.standard_normal((size, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        queries = rng.standard_normal((num_queries, dim)).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        ids = [str(i) for i in range(size)]
+
+        exact = NumpyBackend(vectors, ids, [{"source_id": "BENCH"}] * size)
+        collection = client.create_collection(
+            f"bench_{uuid.uuid4().hex}", metadata=hnsw.collection_metadata()
+        )
+        _add_in_batches(collection, ids, vectors)
+        rows.append({"size": size, **_compare(exact, collection, queries, k, min_recall)})
+        client.delete_collection(collection.name)
+    return rows
+
+
+def benchmark_collection(
+    db_path: str,
+    collection_name: str,
+    num_queries: int = 100,
+    k: int = 4,
+    hnsw: Optional[HNSWParams] = None,
+    min_recall: float = 0.95,
+    seed: int = 0,
+) -> Dict:
+    """Compare backends on a real collection's own embeddings.
+
+    Queries are stored document embeddings with a little noise added, the
+    closest stand-in for real questions that needs no embedding API calls. The
+    persisted collection is only read; with ``hnsw`` its vectors are copied
+    into a temporary in-memory collection built with those settings instead,
+    to try HNSW settings before rebuilding the index with them.
+
+    Returns:
+        Dict: One result row, in the same form as ``benchmark_backends``
+    """
+    rng = np.random.default_rng(seed)
+    collection = chromadb.PersistentClient(path=db_path).get_collection(collection_name)
+    data = collection.get(include=["embeddings"])
+    ids = list(data["ids"])
+    vectors = np.asarray(data["embeddings"], dtype=np.float32)
+    if len(ids) == 0:
+        raise ValueError(f"Collection {collection_name} is empty")
+
+    picks = rng.choice(len(ids), size=min(num_queries, len(ids)), replace=False)
+    scale = float(np.linalg.norm(vectors, axis=1).mean()) * 0.05 / np.sqrt(vectors.shape[1])
+    queries = vectors[picks] + rng.standard_normal((len(picks), vectors.shape[1])).astype(np.float32) * scale
+
+    exact = NumpyBackend(vectors, ids, [{}] * len(ids))
+    if hnsw is None:
+        row = _compare(exact, collection, queries, k, min_recall)
+        settings = {key: value for key, value in (collection.metadata or {}).items() if key.startswith("hnsw:")}
+    else:
+        client = chromadb.EphemeralClient()
+        candidate = client.create_collection(
+            f"bench_{uuid.uuid4().hex}", metadata=hnsw.collection_metadata()
+        )
+        _add_in_batches(candidate, ids, vectors)
+        row = _compare(exact, candidate, queries, k, min_recall)
+        client.delete_collection(candidate.name)
+        settings = hnsw.collection_metadata()
+    return {"size": len(ids), "collection": collection_name, "hnsw": settings, **row}
+
+
+def recommended_threshold(rows: List[Dict]) -> int:
+    """Largest benchmarked size below which NumPy always won, for ``exact_threshold``."""
+    threshold = 0
+    for row in sorted(rows, key=lambda r: r["size"]):
+        if row["best"] != "numpy":
+            break
+        threshold = row["size"]
+    return threshold
+
+
+def main():
+    defaults = HNSWParams()
+    parser = argparse.ArgumentParser(description="Benchmark vector search backends")
+    parser.add_argument("--db-path", default=None,
+                        help="Benchmark the active collection in this database "
+                             "instead of synthetic vectors")
+    parser.add_argument("--collection", default=None,
+                        help="Collection to benchmark with --db-path; defaults to the active one")
+    parser.add_argument("--sizes", default="1000,5000,20000,50000")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--hnsw-m", type=int, default=None,
+                        help=f"HNSW M to try (default {defaults.M}, or the collection's own with --db-path)")
+    parser.add_argument("--hnsw-ef-construction", type=int, default=None,
+                        help=f"HNSW ef_construction to try (default {defaults.ef_construction})")
+    parser.add_argument("--hnsw-ef-search", type=int, default=None,
+                        help=f"HNSW ef_search to try (default {defaults.ef_search})")
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    parser.add_argument("--json", default=None, help="Also write the results to this file")
+    args = parser.parse_args()
+
+    hnsw = None
+    if any(v is not None for v in (args.hnsw_m, args.hnsw_ef_construction, args.hnsw_ef_search)):
+        hnsw = HNSWParams(
+            args.hnsw_m if args.hnsw_m is not None else defaults.M,
+            args.hnsw_ef_construction if args.hnsw_ef_construction is not None else defaults.ef_construction,
+            args.hnsw_ef_search if args.hnsw_ef_search is not None else defaults.ef_search,
+        )
+
+    if args.db_path:
+        # Imported here: index_refresh itself imports this module
+        from index_refresh import read_active_collection
+
+        name = args.collection or read_active_collection(args.db_path)
+        if name is None:
+            parser.error(f"No active collection in {args.db_path}; pass --collection")
+        rows = [benchmark_collection(
+            args.db_path, name, num_queries=args.queries, k=args.k, hnsw=hnsw,
+            min_recall=args.min_recall,
+        )]
+        print(f"Collection {name}, HNSW settings {rows[0]['hnsw']}")
+    else:
+        hnsw = hnsw or defaults
+        rows = benchmark_backends(
+            [int(s) for s in args.sizes.split(",")],
+            dim=args.dim,
+            num_queries=args.queries,
+            k=args.k,
+            hnsw=hnsw,
+            min_recall=args.min_recall,
+        )
+    print(f"{'docs':>8} {'numpy p50':>10} {'chroma p50':>11} {'chroma recall':>14} {'best':>7}")
+    for row in rows:
+        print(f"{row['size']:>8} {row['numpy']['p50_ms']:>8.2f}ms {row['chroma']['p50_ms']:>9.2f}ms "
+              f"{row['chroma']['recall']:>14.3f} {row['best']:>7}")
+    if args.db_path:
+        best = rows[0]["best"]
+        print(f"Recommended backend for this collection: {best}")
+    else:
+        print(f"Recommended exact_threshold: {recommended_threshold(rows)}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"hnsw": hnsw._asdict() if hnsw else None, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()